@@ -0,0 +1,683 @@
+"""UI-free allotment engine (ranking, main exam allotment, CC/lab allotment).
+
+Nothing in here imports streamlit, so the same code can be used from the
+Streamlit app, batch jobs, tests and worker processes.
+"""
+import random
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+# Optional accelerator for the sequential greedy kernel
+try:
+    import numba
+except ImportError:
+    numba = None
+
+# Sentinel values written into `allotted_center` for rows without a seat
+NOT_ALLOTTED_NO_SEAT = "NOT ALLOTTED (NO SEAT)"
+NOT_ALLOTTED_NO_CAPACITY = "NOT ALLOTTED (NO CAPACITY)"
+EXCLUDED_THIS_ROUND = "EXCLUDED_THIS_ROUND"
+MANUAL_FAILED = "MANUAL-FAILED"
+NO_VENUE = "NO_VENUE"
+NO_LAB_SEAT = "NO_LAB_SEAT"
+
+# Categories of the `source` column of main allotments
+SOURCES = ["MANUAL", MANUAL_FAILED, "AUTO", "EXCLUDED"]
+
+# Categories of the `status` column of main allotments, set once per row by
+# the allotment (filter on `status == ALLOTTED` instead of scanning strings)
+ALLOTTED = "ALLOTTED"
+NO_SEAT = "NO_SEAT"
+NO_CAPACITY = "NO_CAPACITY"
+EXCLUDED = "EXCLUDED"
+STATUSES = [ALLOTTED, NO_SEAT, NO_CAPACITY, EXCLUDED]
+
+# `allotted_center` written for each non-allotted status
+UNALLOTTED_CENTERS = {
+    NO_SEAT: NOT_ALLOTTED_NO_SEAT,
+    NO_CAPACITY: NOT_ALLOTTED_NO_CAPACITY,
+    EXCLUDED: EXCLUDED_THIS_ROUND,
+}
+
+# Counters kept by an allotment run, O(centers + venues) in size:
+#   centers  - center_code, capacity, used, remaining
+#   venues   - center_code, venueno, capacity, used, remaining (per venue run)
+#   outcomes - row count per status (index ALLOTTED, ...)
+AllotmentSummary = namedtuple("AllotmentSummary", "centers venues outcomes")
+
+MAIN_COLUMNS = [
+    "round_no",
+    "rank",
+    "user_id",
+    "allotted_center",
+    "venueno",
+    "pref1",
+    "pref2",
+    "pref3",
+    "source",
+    "status",
+]
+
+CC_COLUMNS = [
+    "cc_round_no",
+    "round_no",
+    "rank",
+    "user_id",
+    "exam_center",
+    "cc_venueno",
+    "pref1",
+    "pref2",
+    "pref3",
+    "source",
+]
+
+
+# ------------------ HELPERS ------------------ #
+def generate_rank(df: pd.DataFrame, seed: int = 2025, compat: bool = False) -> pd.DataFrame:
+    """Generate rank based on FCFS (created_at) + random.
+
+    Uses a seeded `numpy.random.Generator` and a single lexsort, so it stays
+    fast for million-row cohorts. `compat=True` runs the original
+    `random.random()` implementation to reproduce legacy ranks for audits.
+    """
+    if compat:
+        return _generate_rank_legacy(df, seed=seed)
+
+    n = len(df)
+    rng = np.random.default_rng(seed)
+
+    # Random score for tie-breaking
+    random_score = rng.random(n)
+
+    # FCFS priority: position of created_at in ascending order (1 = earliest)
+    fcfs_order = np.argsort(df["created_at"].to_numpy(), kind="stable")
+    fcfs_rank = np.empty(n, dtype=np.int32)
+    fcfs_rank[fcfs_order] = np.arange(1, n + 1, dtype=np.int32)
+    fcfs_weight = 1.0 / fcfs_rank  # earlier = bigger weight
+
+    # Combined score: adjust weights if you want
+    final_score = 0.7 * fcfs_weight + 0.3 * random_score
+
+    df["random_score"] = random_score.astype(np.float32)
+    df["fcfs_rank"] = fcfs_rank
+    df["fcfs_weight"] = fcfs_weight.astype(np.float32)
+    df["final_score"] = final_score.astype(np.float32)
+
+    # Final ranking (higher score = higher priority, ties go to earlier FCFS)
+    order = np.lexsort((fcfs_rank, -final_score))
+    df = df.take(order)
+    df.index = pd.RangeIndex(n)
+    df["rank"] = np.arange(1, n + 1, dtype=np.int32)
+
+    return df
+
+
+def _generate_rank_legacy(df: pd.DataFrame, seed: int = 2025) -> pd.DataFrame:
+    """Original per-row `random.random()` ranking, kept for audit parity."""
+    random.seed(seed)
+
+    # Random score for tie-breaking
+    df["random_score"] = [random.random() for _ in range(len(df))]
+
+    # Sort by created_at to get FCFS priority
+    df = df.sort_values(by="created_at", ascending=True)
+    df["fcfs_rank"] = range(1, len(df) + 1)
+    df["fcfs_weight"] = 1 / df["fcfs_rank"]  # earlier = bigger weight
+
+    # Combined score: adjust weights if you want
+    df["final_score"] = 0.7 * df["fcfs_weight"] + 0.3 * df["random_score"]
+
+    # Final ranking (higher score = higher priority)
+    df = df.sort_values(by="final_score", ascending=False).reset_index(drop=True)
+    df["rank"] = range(1, len(df) + 1)
+
+    return df
+
+
+def _categories(values, sentinels) -> pd.Index:
+    """Distinct `values` (first-seen order) followed by any missing `sentinels`."""
+    values = np.concatenate([np.asarray(values, dtype=object), sentinels])
+    return pd.Index(pd.unique(values))
+
+
+def is_allotted(allot_df: pd.DataFrame) -> pd.Series:
+    """Boolean mask of rows holding a real exam center allotment.
+
+    Reads the `status` column; frames saved before it existed fall back to
+    scanning the `allotted_center` sentinels.
+    """
+    if "status" in allot_df.columns:
+        return allot_df["status"] == ALLOTTED
+    return _center_is_allotted(allot_df["allotted_center"])
+
+
+def _center_is_allotted(allotted_center: pd.Series) -> pd.Series:
+    if isinstance(allotted_center.dtype, pd.CategoricalDtype):
+        # Test each category once, then broadcast through the codes
+        cats = pd.Series(allotted_center.cat.categories)
+        # Trailing True: NaN reads as "nan" under astype(str) below
+        lookup = np.append(_center_is_allotted(cats).to_numpy(), True)
+        return pd.Series(
+            lookup[allotted_center.cat.codes.to_numpy()],
+            index=allotted_center.index,
+            name=allotted_center.name,
+        )
+    centers = allotted_center.astype(str)
+    return ~centers.str.startswith("NOT") & ~centers.isin(
+        [EXCLUDED_THIS_ROUND, MANUAL_FAILED]
+    )
+
+
+# ------------------ VENUE SLOTS ------------------ #
+class VenueAllocator:
+    """Hand out venue seats per center in upload order.
+
+    Venues are stored as flat `(venueno, remaining)` runs grouped by center,
+    with one cursor per center pointing at the first run with seats left, so
+    memory scales with the number of venues (not seats) and every assignment
+    is amortized O(1). `centers` fixes the integer code of each center.
+    """
+
+    def __init__(self, center_df: pd.DataFrame, centers: pd.Index = None):
+        codes = center_df["center_code"].astype(str).to_numpy()
+        venues = center_df["venueno"].astype(str).to_numpy()
+        caps = center_df["capacity"].astype(int).to_numpy()
+
+        if centers is None:
+            centers = pd.Index(pd.unique(codes))
+        self.centers = centers
+        self._code = {code: i for i, code in enumerate(centers)}
+
+        cidx = centers.get_indexer(codes)
+        keep = (caps > 0) & (cidx >= 0)
+        order = np.argsort(cidx[keep], kind="stable")
+
+        self.run_center = cidx[keep][order]
+        self.run_venue = venues[keep][order]
+        self.run_left = caps[keep][order].astype(np.int64)
+        self.run_capacity = self.run_left.copy()
+
+        counts = np.bincount(cidx[keep], minlength=len(centers))
+        self.run_end = np.cumsum(counts).astype(np.int64)
+        self.cursor = self.run_end - counts
+
+    def code_of(self, center: str) -> int:
+        """Integer code of `center`, or -1 when it has no capacity rows."""
+        return self._code.get(center, -1)
+
+    def assign_code(self, c: int) -> int:
+        """Take one seat at center code `c`; return its run index or -1."""
+        i = self.cursor[c]
+        if i >= self.run_end[c]:
+            return -1
+
+        self.run_left[i] -= 1
+        if self.run_left[i] == 0:
+            self.cursor[c] = i + 1
+        return i
+
+    def assign(self, center: str) -> str:
+        """Take one seat at `center`; NO_VENUE when its venues are exhausted."""
+        c = self.code_of(center)
+        if c < 0:
+            return NO_VENUE
+
+        i = self.assign_code(c)
+        return NO_VENUE if i < 0 else self.run_venue[i]
+
+    def assign_block(self, codes: np.ndarray) -> np.ndarray:
+        """Assign one seat per entry of `codes` (center codes, -1 = skip).
+
+        Equivalent to calling `assign_code` for each entry in order, but
+        vectorized: the k-th occurrence of a center takes the k-th free seat
+        after its cursor. Returns run indices (-1 = no seat left).
+        """
+        codes = np.asarray(codes, dtype=np.int64)
+        run_idx = np.full(len(codes), -1, dtype=np.int64)
+        valid = np.flatnonzero(codes >= 0)
+        if len(valid) == 0:
+            return run_idx
+
+        # k = how many earlier entries asked for the same center
+        c = codes[valid]
+        order = np.argsort(c, kind="stable")
+        sorted_c = c[order]
+        group_start = np.flatnonzero(np.r_[True, sorted_c[1:] != sorted_c[:-1]])
+        group_len = np.diff(np.r_[group_start, len(sorted_c)])
+        k = np.empty(len(c), dtype=np.int64)
+        k[order] = np.arange(len(c)) - np.repeat(group_start, group_len)
+
+        # Global seat position of that seat across the flat runs
+        seats = np.r_[0, np.cumsum(self.run_left)]
+        target = seats[self.cursor[c]] + k
+        hit = target < seats[self.run_end[c]]
+        runs = np.searchsorted(seats, target[hit], side="right") - 1
+        run_idx[valid[hit]] = runs
+
+        # Consume the seats and move each touched center's cursor
+        np.subtract.at(self.run_left, runs, 1)
+        last_run = np.full(len(self.centers), -1, dtype=np.int64)
+        np.maximum.at(last_run, c[hit], runs)
+        touched = np.flatnonzero(last_run >= 0)
+        last = last_run[touched]
+        self.cursor[touched] = np.where(self.run_left[last] == 0, last + 1, last)
+        return run_idx
+
+    def usage(self) -> pd.DataFrame:
+        """Seats per venue run: center_code, venueno, capacity, used, remaining."""
+        return pd.DataFrame(
+            {
+                "center_code": self.centers.to_numpy()[self.run_center],
+                "venueno": self.run_venue,
+                "capacity": self.run_capacity,
+                "used": self.run_capacity - self.run_left,
+                "remaining": self.run_left.copy(),
+            }
+        )
+
+    def center_usage(self) -> pd.DataFrame:
+        """Venue seats per center: center_code, capacity, used, remaining."""
+        n = len(self.centers)
+        capacity = np.bincount(self.run_center, self.run_capacity, minlength=n)
+        remaining = np.bincount(self.run_center, self.run_left, minlength=n)
+        return pd.DataFrame(
+            {
+                "center_code": self.centers,
+                "capacity": capacity.astype(np.int64),
+                "used": (capacity - remaining).astype(np.int64),
+                "remaining": remaining.astype(np.int64),
+            }
+        )
+
+    def venue_labels(self, run_idx: np.ndarray) -> np.ndarray:
+        """Map run indices from `assign_code` to venueno (NO_VENUE for -1)."""
+        labels = np.full(len(run_idx), NO_VENUE, dtype=object)
+        hit = run_idx >= 0
+        labels[hit] = self.run_venue[run_idx[hit]]
+        return labels
+
+
+# ------------------ KERNELS ------------------ #
+def encode_prefs(ranked_users: pd.DataFrame, centers: pd.Index) -> np.ndarray:
+    """Encode `pref1..pref3` as an (N, 3) int32 matrix of center codes.
+
+    Missing or unknown preferences become -1. Values are compared as `str(p)`,
+    exactly like the original row loop.
+    """
+    prefs = np.empty((len(ranked_users), 3), dtype=np.int32)
+    for j, col in enumerate(["pref1", "pref2", "pref3"]):
+        # Factorize first so str() and the lookup run once per distinct value
+        codes, uniques = pd.factorize(ranked_users[col])
+        # Trailing -1 so missing values (code -1) map to "no center"
+        lookup = np.append(centers.get_indexer([str(v) for v in uniques]), -1)
+        prefs[:, j] = lookup[codes]
+    return prefs
+
+
+def _greedy_allot_arrays(
+    prefs, active, remaining, cursor, run_end, run_left, center_out, run_out
+):
+    """Array form of the greedy kernel (compiled with numba when installed)."""
+    for k in range(prefs.shape[0]):
+        if not active[k]:
+            continue
+        for j in range(prefs.shape[1]):
+            c = prefs[k, j]
+            if c >= 0 and remaining[c] > 0:
+                remaining[c] -= 1
+                center_out[k] = c
+
+                i = cursor[c]
+                if i < run_end[c]:
+                    run_left[i] -= 1
+                    if run_left[i] == 0:
+                        cursor[c] = i + 1
+                    run_out[k] = i
+                break
+
+
+if numba is not None:
+    _greedy_allot_compiled = numba.njit(cache=True, nogil=True)(_greedy_allot_arrays)
+else:
+    _greedy_allot_compiled = None
+
+
+def _greedy_allot_python(prefs, active, remaining, cursor, run_end, run_left):
+    """Pure-Python greedy kernel used when numba is not installed."""
+    n = len(prefs)
+    center_out = [-1] * n
+    run_out = [-1] * n
+
+    # Plain lists are much faster than NumPy scalars inside a Python loop
+    prefs_l = prefs.ravel().tolist()
+    active_l = active.tolist()
+    rem = remaining.tolist()
+    cur = cursor.tolist()
+    end = run_end.tolist()
+    left = run_left.tolist()
+
+    for k in range(n):
+        if not active_l[k]:
+            continue
+        for c in prefs_l[3 * k : 3 * k + 3]:
+            if c >= 0 and rem[c] > 0:
+                rem[c] -= 1
+                center_out[k] = c
+
+                i = cur[c]
+                if i < end[c]:
+                    left[i] -= 1
+                    if left[i] == 0:
+                        cur[c] = i + 1
+                    run_out[k] = i
+                break
+
+    remaining[:] = rem
+    cursor[:] = cur
+    run_left[:] = left
+    return np.array(center_out, dtype=np.int32), np.array(run_out, dtype=np.int64)
+
+
+def greedy_allot(prefs, active, remaining, cursor, run_end, run_left, compiled=None):
+    """Rank-ordered greedy over preferences against center capacity.
+
+    Rows are processed in order; an `active` row takes its first preference
+    with `remaining > 0` plus the next venue seat there. Returns
+    `(center_idx, run_idx)` arrays (-1 = none) and updates `remaining`,
+    `cursor` and `run_left` in place.
+
+    The numba-compiled kernel is used when available; `compiled=False`
+    forces the pure-Python path (e.g. for parity checks).
+    """
+    if compiled is None:
+        compiled = _greedy_allot_compiled is not None
+    if not compiled:
+        return _greedy_allot_python(prefs, active, remaining, cursor, run_end, run_left)
+    if _greedy_allot_compiled is None:
+        raise RuntimeError("numba is not installed; use compiled=False")
+
+    n = len(prefs)
+    center_out = np.full(n, -1, dtype=np.int32)
+    run_out = np.full(n, -1, dtype=np.int64)
+    _greedy_allot_compiled(
+        np.ascontiguousarray(prefs, dtype=np.int32),
+        np.ascontiguousarray(active, dtype=np.bool_),
+        remaining,
+        cursor,
+        run_end,
+        run_left,
+        center_out,
+        run_out,
+    )
+    return center_out, run_out
+
+
+# ------------------ ENGINE ------------------ #
+class AllotmentEngine:
+    """Rank candidates and allot exam centers / CC labs without any UI.
+
+    `center_df` must have `center_code, venueno, capacity` columns; a
+    normalized copy (string codes, int capacity) is kept, the caller's
+    frame is not modified. `compiled`
+    selects the greedy kernel: None uses numba when installed, False forces
+    the pure-Python fallback.
+
+    After `allot_main` / `allot_cc`, `main_summary` / `cc_summary` hold that
+    run's `AllotmentSummary` (seat counters and outcome tallies), so
+    dashboards need no second pass over the candidate rows.
+    """
+
+    def __init__(
+        self,
+        center_df: pd.DataFrame,
+        seed: int = 2025,
+        round_no: int = 1,
+        legacy_rank: bool = False,
+        compiled: bool = None,
+    ):
+        # assign() returns a new frame; the caller's center_df is untouched
+        self.center_df = center_df.assign(
+            center_code=center_df["center_code"].astype(str),
+            venueno=center_df["venueno"].astype(str),
+            capacity=center_df["capacity"].astype(int),
+        )
+        self.seed = seed
+        self.round_no = round_no
+        self.legacy_rank = legacy_rank
+        self.compiled = compiled
+        self.main_summary = None
+        self.cc_summary = None
+
+    def rank(self, users_df: pd.DataFrame) -> pd.DataFrame:
+        """Return `users_df` ranked by FCFS + seeded random score."""
+        # assign() returns a new frame without deep-copying the other columns
+        # (ensures created_at is datetime)
+        df = users_df.assign(created_at=pd.to_datetime(users_df["created_at"]))
+
+        return generate_rank(df, seed=self.seed, compat=self.legacy_rank)
+
+    def allot_main(
+        self,
+        ranked_users: pd.DataFrame,
+        excluded_users=(),
+        fixed_assignments=None,
+    ) -> pd.DataFrame:
+        """Allot exam centers (and venues) to `ranked_users` in rank order.
+
+        `fixed_assignments` maps user_id (str) -> center_code and is applied
+        before the automatic pass; `excluded_users` are recorded as
+        EXCLUDED_THIS_ROUND without consuming a seat.
+        """
+        fixed_assignments = fixed_assignments or {}
+        round_no = self.round_no
+
+        # Sum capacity per center (total seats available at center level)
+        capacity = self.center_df.groupby("center_code")["capacity"].sum()
+        centers = capacity.index
+
+        # remaining is center-level seats left, indexed by center code
+        remaining = capacity.to_numpy().astype(np.int64)
+        venues = VenueAllocator(self.center_df, centers)
+
+        # Hash-based Index.isin (np.isin compares object arrays pairwise)
+        user_ids = pd.Index(ranked_users["user_id"].astype(str))
+        manual_mask = user_ids.isin(list(fixed_assignments.keys()))
+        excluded_mask = user_ids.isin(list(set(excluded_users))) & ~manual_mask
+        user_ids = user_ids.to_numpy()
+
+        # Output columns are built as integer codes into these categories
+        sentinels = list(UNALLOTTED_CENTERS.values())
+        center_cats = _categories(centers, sentinels)
+        venue_cats = _categories(venues.run_venue, ["", NO_VENUE])
+        no_seat, no_capacity, excluded = center_cats.get_indexer(sentinels)
+        blank, no_venue = venue_cats.get_indexer(["", NO_VENUE])
+        # Venue code per run; trailing NO_VENUE so run index -1 maps to it
+        run_code = np.append(venue_cats.get_indexer(venues.run_venue), no_venue)
+
+        # 1) Apply manual fixed assignments first
+        manual_pos = []
+        manual_center = []
+        manual_venue = []
+        manual_source = []
+        manual_status = []
+        for user_str, center_code in fixed_assignments.items():
+            # Find the user row
+            hits = np.flatnonzero(user_ids == user_str)
+            if len(hits) == 0:
+                continue  # user not found
+
+            manual_pos.append(hits[0])
+            c = venues.code_of(center_code)
+
+            # Check capacity
+            if c >= 0 and remaining[c] > 0:
+                # Allocate center-level seat and a venue if available (NO_VENUE
+                # when center capacity indicated a seat but no venue is left)
+                remaining[c] -= 1
+                manual_center.append(c)
+                manual_venue.append(run_code[venues.assign_code(c)])
+                manual_source.append(SOURCES.index("MANUAL"))
+                manual_status.append(STATUSES.index(ALLOTTED))
+            else:
+                manual_center.append(no_capacity)
+                manual_venue.append(blank)
+                manual_source.append(SOURCES.index(MANUAL_FAILED))
+                manual_status.append(STATUSES.index(NO_CAPACITY))
+
+        # 2) Automatic allotment by rank for users not handled manually or
+        #    excluded, over integer-coded prefs and capacities
+        auto_pos = np.flatnonzero(~manual_mask)
+        prefs = encode_prefs(ranked_users.iloc[auto_pos], centers)
+        active = ~excluded_mask[auto_pos]
+
+        center_idx, run_idx = greedy_allot(
+            prefs,
+            active,
+            remaining,
+            venues.cursor,
+            venues.run_end,
+            venues.run_left,
+            compiled=self.compiled,
+        )
+        allotted = center_idx >= 0
+
+        # Preallocated output codes (center codes are category positions)
+        center_code = np.full(len(auto_pos), no_seat, dtype=np.int32)
+        center_code[allotted] = center_idx[allotted]
+        center_code[~active] = excluded
+
+        venue_code = np.full(len(auto_pos), blank, dtype=np.int32)
+        venue_code[allotted] = run_code[run_idx[allotted]]
+
+        source_code = np.where(
+            active, SOURCES.index("AUTO"), SOURCES.index("EXCLUDED")
+        ).astype(np.int8)
+
+        status_code = np.where(
+            allotted, STATUSES.index(ALLOTTED), STATUSES.index(NO_SEAT)
+        ).astype(np.int8)
+        status_code[~active] = STATUSES.index(EXCLUDED)
+
+        # Manual rows first, then automatic rows in rank order
+        pos = np.concatenate([np.asarray(manual_pos, dtype=np.int64), auto_pos])
+        picked = ranked_users.iloc[pos]
+        status = np.concatenate([np.asarray(manual_status, np.int8), status_code])
+
+        # Counters straight from the allocator (used = capacity - remaining)
+        self.main_summary = AllotmentSummary(
+            centers=pd.DataFrame(
+                {
+                    "center_code": centers,
+                    "capacity": capacity.to_numpy(),
+                    "used": capacity.to_numpy() - remaining,
+                    "remaining": remaining,
+                }
+            ),
+            venues=venues.usage(),
+            outcomes=pd.Series(
+                np.bincount(status, minlength=len(STATUSES)), index=STATUSES
+            ),
+        )
+
+        return pd.DataFrame(
+            {
+                "round_no": np.int32(round_no),
+                "rank": picked["rank"].to_numpy(dtype=np.int32),
+                "user_id": picked["user_id"].to_numpy(),
+                "allotted_center": pd.Categorical.from_codes(
+                    np.concatenate([np.asarray(manual_center, np.int32), center_code]),
+                    categories=center_cats,
+                ),
+                "venueno": pd.Categorical.from_codes(
+                    np.concatenate([np.asarray(manual_venue, np.int32), venue_code]),
+                    categories=venue_cats,
+                ),
+                # .array keeps categorical prefs (see ingest) categorical
+                "pref1": picked["pref1"].array,
+                "pref2": picked["pref2"].array,
+                "pref3": picked["pref3"].array,
+                "source": pd.Categorical.from_codes(
+                    np.concatenate([np.asarray(manual_source, np.int8), source_code]),
+                    categories=SOURCES,
+                ),
+                "status": pd.Categorical.from_codes(status, categories=STATUSES),
+            },
+            columns=MAIN_COLUMNS,
+        )
+
+    def allot_cc(
+        self,
+        final_allot_df: pd.DataFrame,
+        lab_df: pd.DataFrame,
+        cc_round_no: int = 1,
+    ) -> pd.DataFrame:
+        """Allot CC / lab venues to candidates holding a valid exam center.
+
+        `lab_df` must have `collegecode, venueno, tempvno` columns; the
+        candidate's exam center must match `collegecode`. Returns an empty
+        frame when no candidate is eligible.
+        """
+        # Normalize types (on a new frame; the caller's lab_df is untouched)
+        lab_df = lab_df.assign(
+            collegecode=lab_df["collegecode"].astype(str),
+            venueno=lab_df["venueno"].astype(str),
+            tempvno=lab_df["tempvno"].astype(int),
+        )
+
+        # Capacity per (collegecode, venueno), sorted once by venueno within
+        # each college so the smallest venue with seats left is used first
+        labs = (
+            lab_df.groupby(["collegecode", "venueno"])["tempvno"]
+            .sum()
+            .reset_index()
+            .rename(columns={"collegecode": "center_code", "tempvno": "capacity"})
+        )
+        lab_seats = VenueAllocator(labs)
+
+        # Eligible users = those with a valid exam center allotment,
+        # sorted by exam rank (same priority order)
+        valid_exam = final_allot_df[is_allotted(final_allot_df)]
+        valid_exam = valid_exam.sort_values(by="rank")
+
+        # College (= exam center) of each candidate must match collegecode
+        colleges = lab_seats.centers.get_indexer(
+            valid_exam["allotted_center"].astype(str)
+        )
+        run_idx = lab_seats.assign_block(colleges)
+
+        # Lab venue code per run; trailing NO_LAB_SEAT for run index -1
+        lab_cats = _categories(lab_seats.run_venue, [NO_LAB_SEAT])
+        run_code = np.append(
+            lab_cats.get_indexer(lab_seats.run_venue), lab_cats.get_loc(NO_LAB_SEAT)
+        )
+        cc_venueno = pd.Categorical.from_codes(run_code[run_idx], categories=lab_cats)
+
+        seated = int((run_idx >= 0).sum())
+        self.cc_summary = AllotmentSummary(
+            centers=lab_seats.center_usage(),
+            venues=lab_seats.usage(),
+            outcomes=pd.Series(
+                [seated, len(run_idx) - seated], index=[ALLOTTED, NO_LAB_SEAT]
+            ),
+        )
+
+        return pd.DataFrame(
+            {
+                "cc_round_no": np.int32(cc_round_no),
+                "round_no": valid_exam["round_no"].to_numpy(dtype=np.int32),
+                "rank": valid_exam["rank"].to_numpy(dtype=np.int32),
+                "user_id": valid_exam["user_id"].to_numpy(),
+                # .array keeps categorical columns categorical
+                "exam_center": valid_exam["allotted_center"].array,
+                "cc_venueno": cc_venueno,
+                "pref1": valid_exam["pref1"].array,
+                "pref2": valid_exam["pref2"].array,
+                "pref3": valid_exam["pref3"].array,
+                "source": pd.Categorical.from_codes(
+                    np.zeros(len(valid_exam), dtype=np.int8), categories=["CC-AUTO"]
+                ),
+            },
+            columns=CC_COLUMNS,
+        )
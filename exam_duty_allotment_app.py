@@ -1,16 +1,33 @@
 import streamlit as st
 import pandas as pd
-import random
-import io
+import hashlib
 import os
 from datetime import datetime
 
+from allotment_engine import (
+    ALLOTTED,
+    EXCLUDED,
+    NO_LAB_SEAT,
+    UNALLOTTED_CENTERS,
+    AllotmentEngine,
+    is_allotted,
+)
+from ingest import CENTERS, LABS, USERS, format_stats, load_table
+from storage import (
+    drop_locked_round,
+    PublishedCache,
+    get_store,
+    load_locked_users,
+    publish,
+    save_locked_round,
+    unpublish,
+)
+
 # For email (auto-email duty slips)
-import smtplib
-from email.mime.multipart import MIMEMultipart
-from email.mime.base import MIMEBase
-from email.mime.text import MIMEText
-from email import encoders
+from mailer import Outbox
+
+# Slip PDFs / emails run as background jobs
+from jobs import JobRunner, slip_job
 
 # ------------------ GLOBAL SETUP ------------------ #
 st.set_page_config(page_title="Exam & CC Allotment System", layout="wide")
@@ -26,57 +43,227 @@ DATA_DIR = "data"
 os.makedirs(DATA_DIR, exist_ok=True)
 
 
+@st.cache_resource
+def get_round_store():
+    """Round history backend (Parquet when pyarrow is available, else CSV).
+
+    Created once per server process, not per rerun, so a MySQL store's
+    connection pool is shared by every session.
+    """
+    return get_store(DATA_DIR)
+
+
+store = get_round_store()
+
+OUTBOX_PATH = os.path.join(DATA_DIR, "email_outbox.sqlite")
+JOBS_PATH = os.path.join(DATA_DIR, "jobs.sqlite")
+
+
 # ------------------ HELPERS ------------------ #
-def generate_rank(df: pd.DataFrame, seed: int = 2025) -> pd.DataFrame:
-    """Generate rank based on FCFS (created_at) + random."""
-    random.seed(seed)
-
-    # Random score for tie-breaking
-    df["random_score"] = [random.random() for _ in range(len(df))]
-
-    # Sort by created_at to get FCFS priority
-    df = df.sort_values(by="created_at", ascending=True)
-    df["fcfs_rank"] = range(1, len(df) + 1)
-    df["fcfs_weight"] = 1 / df["fcfs_rank"]  # earlier = bigger weight
-
-    # Combined score: adjust weights if you want
-    df["final_score"] = 0.7 * df["fcfs_weight"] + 0.3 * df["random_score"]
-
-    # Final ranking (higher score = higher priority)
-    df = df.sort_values(by="final_score", ascending=False).reset_index(drop=True)
-    df["rank"] = range(1, len(df) + 1)
-
-    return df
-
-
-def send_email_with_attachment(
-    to_email,
-    subject,
-    body,
-    attachment_bytes,
-    filename,
-    smtp_host,
-    smtp_port,
-    smtp_user,
-    smtp_pass,
+def upload_digest(uploaded_file) -> str:
+    """Content hash of an uploaded file, used as a cache key across reruns."""
+    return hashlib.sha256(uploaded_file.getvalue()).hexdigest()
+
+
+UPLOAD_SCHEMAS = {"users": USERS, "centers": CENTERS, "labs": LABS}
+
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def read_upload(digest: str, name: str, kind: str, _data: bytes):
+    """Parse an uploaded CSV/XLSX once per distinct file content.
+
+    Typed per `kind` ("users" / "centers" / "labs"); returns (df, LoadStats).
+    """
+    return load_table(_data, name, UPLOAD_SCHEMAS[kind])
+
+
+@st.cache_data(max_entries=8, show_spinner="Computing main allotment...")
+def compute_main_allotment(
+    users_digest,
+    center_digest,
+    seed,
+    round_no,
+    legacy_rank,
+    excluded,
+    fixed,
+    _engine,
+    _users_df,
+):
+    """Rank + main allotment, cached on (file hashes, seed, round, overrides).
+
+    Returns `(ranked_users, final_allot_df, main_summary)`.
+    """
+    ranked_users = _engine.rank(_users_df)
+    final_allot_df = _engine.allot_main(
+        ranked_users,
+        excluded_users=list(excluded),
+        fixed_assignments=dict(fixed),
+    )
+    return ranked_users, final_allot_df, _engine.main_summary
+
+
+@st.cache_data(max_entries=8, show_spinner="Computing CC allotment...")
+def compute_cc_allotment(
+    main_key, lab_digest, cc_round_no, _engine, _final_allot_df, _lab_df
 ):
-    msg = MIMEMultipart()
-    msg["From"] = smtp_user
-    msg["To"] = to_email
-    msg["Subject"] = subject
+    """CC / lab allotment, cached on (main allotment key, lab file hash, CC round).
+
+    Returns `(cc_allot_df, cc_summary)`.
+    """
+    cc_allot_df = _engine.allot_cc(_final_allot_df, _lab_df, cc_round_no=cc_round_no)
+    return cc_allot_df, _engine.cc_summary
+
+
+@st.cache_resource
+def get_published_cache():
+    """Published allotments shared by every portal session of this process."""
+    return PublishedCache(store)
+
+
+@st.cache_resource
+def get_slip_cache():
+    """Rendered per-candidate slips for the portal, shared by all sessions."""
+    from slips import SlipCache
+
+    return SlipCache(os.path.join(DATA_DIR, "slip_cache"))
+
+
+def prune_slip_cache():
+    """Drop cached portal slips of rounds no longer published."""
+    keep = set()
+    for name in ("allotments_latest", "cc_allotments_latest"):
+        if store.exists(name):
+            keep.update(store.load(name, columns=["round_no"])["round_no"].unique())
+    get_slip_cache().prune(keep)
+
+
+@st.cache_resource
+def get_saved_keys():
+    """name -> computation key of the last save of that frame by this process."""
+    return {}
+
+
+def save_if_new(name, key, save) -> bool:
+    """Run `save()` (a store.save / publish call) unless `name` was last
+    saved from the same computation `key`.
+
+    An unchanged rerun then skips re-fingerprinting the frame. Returns what
+    `save()` returned, or False when skipped.
+    """
+    saved = get_saved_keys()
+    if saved.get(name) == key and store.exists(name):
+        return False
+    changed = save()
+    saved[name] = key
+    return changed
+
+
+@st.cache_resource
+def get_job_runner():
+    """Background job runner shared by all sessions of this server process."""
+    return JobRunner(JOBS_PATH)
+
+
+def submit_slip_job(label, name, kind, base_name, group_key, layout, email=None):
+    """Queue duty slip rendering (+ optional emails) as a background job.
+
+    The job loads the saved allotment `name` itself, so nothing large is
+    converted or pickled on this page. Output goes to DATA_DIR as one merged
+    PDF or a ZIP of per-center PDFs; progress and the download appear under
+    Background Jobs.
+    """
+    as_zip = layout == "ZIP of per-center PDFs"
+    runner = get_job_runner()
+    job_id = runner.submit(
+        kind,
+        label,
+        slip_job,
+        data_dir=DATA_DIR,
+        name=name,
+        kind=kind,
+        out_path=os.path.join(DATA_DIR, base_name + (".zip" if as_zip else ".pdf")),
+        layout="zip" if as_zip else "merged",
+        group_key=group_key,
+        email=email,
+        workers=runner.cpus_per_job,
+    )
+    st.success(f"Queued background job {job_id}: {label}")
+
+
+def email_job_args(prefix, users_name, subject, body, filename_prefix):
+    """`slip_job` email settings from the sidebar SMTP controls.
+
+    Recipients come from the "email" column of the saved users frame
+    `users_name`; slips of users without one aren't mailed. Outbox keys
+    are `prefix + user_id:slip hash`, so a re-run (e.g. after a crash) only
+    sends what is not yet sent, and a changed slip is sent again.
+    """
+    return dict(
+        outbox_path=OUTBOX_PATH,
+        prefix=prefix,
+        users=users_name,
+        smtp=(smtp_host, int(smtp_port), smtp_user, smtp_pass),
+        from_addr=smtp_from or smtp_user,
+        starttls=smtp_starttls,
+        subject=subject,
+        body=body,
+        filename_prefix=filename_prefix,
+        connections=int(smtp_connections),
+        per_second=float(smtp_rate),
+    )
+
 
-    msg.attach(MIMEText(body, "plain"))
+def slip_download_button(label, path, mime):
+    """Download button for a slip file in DATA_DIR.
 
-    part = MIMEBase("application", "octet-stream")
-    part.set_payload(attachment_bytes)
-    encoders.encode_base64(part)
-    part.add_header("Content-Disposition", f"attachment; filename={filename}")
-    msg.attach(part)
+    The file is only read when the button is clicked (deferred download),
+    so reruns don't pull multi-thousand-page PDFs into memory.
+    """
+
+    def _read():
+        with open(path, "rb") as f:
+            return f.read()
+
+    st.download_button(
+        label=label,
+        data=_read,
+        file_name=os.path.basename(path),
+        mime=mime,
+    )
 
-    with smtplib.SMTP(smtp_host, smtp_port) as server:
-        server.starttls()
-        server.login(smtp_user, smtp_pass)
-        server.send_message(msg)
+
+@st.fragment(run_every=2)
+def show_jobs_panel():
+    """Recent background jobs with progress, timings and downloads (auto-refreshing)."""
+    jobs = get_job_runner().recent(limit=10)
+    if not jobs:
+        st.caption("No background jobs yet.")
+        return
+
+    for job in jobs:
+        started = job["started_at"] or job["created_at"]
+        elapsed = (job["finished_at"] or datetime.now().timestamp()) - started
+        st.markdown(
+            f"**{job['label']}** · `{job['id']}` · {job['status']} · "
+            f"{elapsed:.1f}s"
+        )
+        if job["status"] in ("queued", "running"):
+            st.progress(
+                job["done"] / job["total"] if job["total"] else 0.0,
+                text=f"{job['message'] or 'Waiting...'} "
+                f"({job['done']} / {job['total']})",
+            )
+        elif job["status"] == "failed":
+            st.error(job["error"])
+        else:
+            if job["message"]:
+                st.text(job["message"])
+            if job["artifact"] and os.path.exists(job["artifact"]):
+                slip_download_button(
+                    f"Download {os.path.basename(job['artifact'])} ({job['id']})",
+                    job["artifact"],
+                    job["mime"],
+                )
 
 
 # ------------------ SIDEBAR CONTROLS ------------------ #
@@ -84,6 +271,9 @@ st.sidebar.header("Global Settings")
 
 seed = st.sidebar.number_input("Random Seed (for reproducible ranking)", value=2025)
 round_no = st.sidebar.number_input("Main Allotment Round Number", value=1, min_value=1)
+legacy_rank = st.sidebar.checkbox(
+    "Legacy ranking (reproduce pre-NumPy ranks for audits)", value=False
+)
 
 # Mode switch
 mode = st.sidebar.radio(
@@ -98,28 +288,46 @@ enable_email = st.sidebar.checkbox("Enable Auto Email Exam Duty Slips", value=Fa
 if enable_email:
     smtp_host = st.sidebar.text_input("SMTP Host", value="smtp.gmail.com")
     smtp_port = st.sidebar.number_input("SMTP Port", value=587)
-    smtp_user = st.sidebar.text_input("SMTP Username (From Email)")
+    smtp_user = st.sidebar.text_input("SMTP Username (empty: no login)")
     smtp_pass = st.sidebar.text_input("SMTP Password", type="password")
+    smtp_from = st.sidebar.text_input("From Email (default: the username)")
+    smtp_starttls = st.sidebar.checkbox("Use STARTTLS", value=True)
+    smtp_connections = st.sidebar.number_input(
+        "Parallel SMTP Connections", value=4, min_value=1, max_value=32
+    )
+    smtp_rate = st.sidebar.number_input(
+        "Max Emails per Second (0 = unlimited)", value=5.0, min_value=0.0
+    )
 else:
-    smtp_host = smtp_port = smtp_user = smtp_pass = None
+    smtp_host = smtp_port = smtp_user = smtp_pass = smtp_from = None
+    smtp_starttls, smtp_connections, smtp_rate = True, 1, 0.0
+# Logging in is optional (e.g. a relay trusting this host); a sender isn't
+smtp_ready = bool(smtp_host and (smtp_from or smtp_user))
+
+slip_layout = st.sidebar.radio(
+    "Duty Slip PDF Output",
+    ["Single merged PDF", "ZIP of per-center PDFs"],
+    index=0,
+)
 
 st.sidebar.markdown("---")
 st.sidebar.markdown("🕒 Round Management (Main Allotment)")
 
 if st.sidebar.button("Rollback Last Main Round"):
-    round_files = []
-    for fname in os.listdir(DATA_DIR):
-        if fname.startswith("allotments_round_") and fname.endswith(".csv"):
-            try:
-                rno = int(fname.replace("allotments_round_", "").replace(".csv", ""))
-                round_files.append((rno, fname))
-            except ValueError:
-                continue
+    round_files = store.list_rounds("allotments_round_")
     if not round_files:
         st.sidebar.warning("No main round data found to rollback.")
     else:
         max_round, max_file = max(round_files, key=lambda x: x[0])
-        os.remove(os.path.join(DATA_DIR, max_file))
+        store.remove(max_file)
+        store.remove(f"users_round_{max_round}")
+        store.remove(f"centers_round_{max_round}")
+        drop_locked_round(store, max_round)
+        # Slips of the rolled-back round may be re-sent for its re-run
+        if os.path.exists(OUTBOX_PATH):
+            with Outbox(OUTBOX_PATH) as outbox:
+                outbox.forget(f"exam:{max_round}:")
+                outbox.forget(f"cc:{max_round}:")
         st.sidebar.success(
             f"Rolled back main round {max_round}. Please reload allotment for next round."
         )
@@ -127,13 +335,13 @@ if st.sidebar.button("Rollback Last Main Round"):
         remaining = [rf for rf in round_files if rf[0] != max_round]
         if remaining:
             new_max_round, new_file = max(remaining, key=lambda x: x[0])
-            prev_df = pd.read_csv(os.path.join(DATA_DIR, new_file))
-            latest_file = os.path.join(DATA_DIR, "allotments_latest.csv")
-            prev_df.to_csv(latest_file, index=False)
+            prev_df = store.load(new_file)
+            publish(store, "allotments_latest", prev_df)
         else:
-            latest_file = os.path.join(DATA_DIR, "allotments_latest.csv")
-            if os.path.exists(latest_file):
-                os.remove(latest_file)
+            unpublish(store, "allotments_latest")
+        get_published_cache().invalidate("allotments_latest")
+        get_slip_cache().invalidate(max_round)
+        get_saved_keys().clear()
 
 st.sidebar.markdown("---")
 st.sidebar.markdown("⚙️ Use the controls below & upload files in the main area.")
@@ -145,30 +353,25 @@ st.sidebar.markdown("⚙️ Use the controls below & upload files in the main ar
 if mode == "Admin - Allotment":
 
     # ------------------ AUTO-LOCK USERS FROM PREVIOUS ROUNDS ------------------ #
-    locked_users = set()
-    for fname in os.listdir(DATA_DIR):
-        if fname.startswith("allotments_round_") and fname.endswith(".csv"):
-            try:
-                rno = int(fname.replace("allotments_round_", "").replace(".csv", ""))
-            except ValueError:
-                continue
-            if rno >= round_no:
-                continue
-            prev_df = pd.read_csv(os.path.join(DATA_DIR, fname))
-            valid_prev = prev_df[
-                prev_df["allotted_center"].astype(str).str.startswith("NOT") == False
-            ]
-            valid_prev = valid_prev[
-                ~valid_prev["allotted_center"].isin(
-                    ["EXCLUDED_THIS_ROUND", "MANUAL-FAILED"]
-                )
-            ]
-            locked_users.update(valid_prev["user_id"].astype(str).tolist())
+    # Persisted index of users allotted in earlier rounds; maintained when a
+    # round is saved or rolled back, so this is a single columnar read
+    locked_users = load_locked_users(store, before_round=round_no)
 
     st.sidebar.markdown(
         f"🔒 Auto-locked users from previous main rounds: {len(locked_users)}"
     )
 
+    # ------------------ BACKGROUND JOBS ------------------ #
+    # In the sidebar, so jobs stay visible without the upload files
+    with st.sidebar:
+        st.markdown("---")
+        st.markdown("### ⏳ Background Jobs")
+        st.caption(
+            "Slip PDFs and emails keep running if you reload or leave this page; "
+            "downloads appear here when a job is done."
+        )
+        show_jobs_panel()
+
     # ------------------ FILE UPLOADS ------------------ #
     st.subheader("📥 Upload Data Files (Main Exam Allotment)")
 
@@ -189,19 +392,23 @@ if mode == "Admin - Allotment":
         )
 
     if user_file and center_file:
-        # Read user file
-        if user_file.name.endswith(".csv"):
-            users_df = pd.read_csv(user_file)
-        else:
-            users_df = pd.read_excel(user_file)
+        # Read user file and centers file (with venueno rows); parsed frames
+        # are cached on file content so reruns skip re-parsing
+        users_digest = upload_digest(user_file)
+        users_df, users_stats = read_upload(
+            users_digest, user_file.name, "users", user_file.getvalue()
+        )
 
-        # Read centers file (with venueno rows)
-        if center_file.name.endswith(".csv"):
-            center_df = pd.read_csv(center_file)
-        else:
-            center_df = pd.read_excel(center_file)
+        center_digest = upload_digest(center_file)
+        center_df, center_stats = read_upload(
+            center_digest, center_file.name, "centers", center_file.getvalue()
+        )
 
         st.success("✅ Files uploaded successfully.")
+        st.caption(
+            f"Users: {format_stats(users_stats)} · "
+            f"Centers: {format_stats(center_stats)}"
+        )
 
         st.markdown("### 👥 Users Data")
         st.dataframe(users_df, use_container_width=True)
@@ -222,13 +429,10 @@ if mode == "Admin - Allotment":
                 st.error(f"❌ Center file missing required column: **{col}**")
                 st.stop()
 
-        # Ensure created_at is datetime
-        users_df["created_at"] = pd.to_datetime(users_df["created_at"])
-
-        # Normalize center_df types
-        center_df["center_code"] = center_df["center_code"].astype(str)
-        center_df["venueno"] = center_df["venueno"].astype(str)
-        center_df["capacity"] = center_df["capacity"].astype(int)
+        # Engine keeps a normalized copy (string codes, int capacity)
+        engine = AllotmentEngine(
+            center_df, seed=seed, round_no=round_no, legacy_rank=legacy_rank
+        )
 
         # ------------------ ADMIN OVERRIDES ------------------ #
         st.markdown("## 🛠 Admin Override Panel (Main)")
@@ -268,157 +472,27 @@ if mode == "Admin - Allotment":
         # ------------------ RANK GENERATION ------------------ #
         st.markdown("## 🏅 Ranking (Random + FCFS)")
 
-        ranked_users = generate_rank(users_df.copy(), seed=seed)
+        # Ranking and allotment are cached on (file hashes, seed, round_no,
+        # exclusions, overrides) so widget clicks don't recompute them.
+        # Manual fixed assignments are applied first, then automatic
+        # allotment by rank for everyone not handled manually or excluded
+        main_key = (
+            users_digest,
+            center_digest,
+            int(seed),
+            int(round_no),
+            bool(legacy_rank),
+            tuple(sorted(excluded_users)),
+            tuple(sorted(fixed_assignments.items())),
+        )
+        ranked_users, final_allot_df, main_summary = compute_main_allotment(
+            *main_key, _engine=engine, _users_df=users_df
+        )
         st.dataframe(ranked_users, use_container_width=True)
 
-        # ------------------ CAPACITY DICT & VENUE MAP ------------------ #
-        # Sum capacity per center (total seats available at center level)
-        capacity_dict = center_df.groupby("center_code")["capacity"].sum().to_dict()
-
-        # Build venue slots per center: center_code -> list of venueno (each repeated by its capacity)
-        venue_map = {}
-        for _, r in center_df.iterrows():
-            center = str(r["center_code"])
-            venue = str(r["venueno"])
-            cap = int(r["capacity"])
-            venue_map.setdefault(center, [])
-            for _ in range(cap):
-                venue_map[center].append(venue)
-
-        # remaining_capacity is center-level seats left
-        remaining_capacity = capacity_dict.copy()
-
         # ------------------ ALLOTMENT PROCESSING ------------------ #
         st.markdown("## 🎯 Main Exam Allotment Processing")
 
-        allot_records = []
-
-        # 1) Apply manual fixed assignments first
-        for user_str, center_code in fixed_assignments.items():
-            # Find the user row
-            row = ranked_users[ranked_users["user_id"].astype(str) == user_str]
-            if row.empty:
-                continue  # user not found
-
-            row = row.iloc[0]
-
-            # Check capacity
-            if center_code in remaining_capacity and remaining_capacity[center_code] > 0:
-                # Allocate center-level seat
-                remaining_capacity[center_code] -= 1
-
-                # Assign venue if available
-                venue_no = None
-                if center_code in venue_map and venue_map[center_code]:
-                    venue_no = venue_map[center_code].pop(0)
-                else:
-                    # no venue available even if center capacity indicated (edge case)
-                    venue_no = "NO_VENUE"
-
-                allot_records.append(
-                    {
-                        "round_no": round_no,
-                        "rank": row["rank"],
-                        "user_id": row["user_id"],
-                        "allotted_center": center_code,
-                        "venueno": venue_no,
-                        "pref1": row["pref1"],
-                        "pref2": row["pref2"],
-                        "pref3": row["pref3"],
-                        "source": "MANUAL",
-                    }
-                )
-            else:
-                allot_records.append(
-                    {
-                        "round_no": round_no,
-                        "rank": row["rank"],
-                        "user_id": row["user_id"],
-                        "allotted_center": "NOT ALLOTTED (NO CAPACITY)",
-                        "venueno": "",
-                        "pref1": row["pref1"],
-                        "pref2": row["pref2"],
-                        "pref3": row["pref3"],
-                        "source": "MANUAL-FAILED",
-                    }
-                )
-
-        # Users already handled manually or excluded should not be auto-processed
-        manually_handled_users = set(fixed_assignments.keys())
-        excluded_users_set = set(excluded_users)
-
-        # 2) Automatic allotment by rank for remaining users
-        for _, row in ranked_users.iterrows():
-            u_str = str(row["user_id"])
-            if u_str in manually_handled_users:
-                continue
-            if u_str in excluded_users_set:
-                allot_records.append(
-                    {
-                        "round_no": round_no,
-                        "rank": row["rank"],
-                        "user_id": row["user_id"],
-                        "allotted_center": "EXCLUDED_THIS_ROUND",
-                        "venueno": "",
-                        "pref1": row["pref1"],
-                        "pref2": row["pref2"],
-                        "pref3": row["pref3"],
-                        "source": "EXCLUDED",
-                    }
-                )
-                continue
-
-            prefs = [row["pref1"], row["pref2"], row["pref3"]]
-            allotted_center = None
-            assigned_venue = ""
-
-            for p in prefs:
-                if pd.isna(p):
-                    continue
-                p_str = str(p)
-                if p_str in remaining_capacity and remaining_capacity[p_str] > 0:
-                    # allocate at center level
-                    remaining_capacity[p_str] -= 1
-                    allotted_center = p_str
-
-                    # assign a venue from the venue_map
-                    if p_str in venue_map and venue_map[p_str]:
-                        assigned_venue = venue_map[p_str].pop(0)
-                    else:
-                        assigned_venue = "NO_VENUE"
-                    break
-
-            if allotted_center is None:
-                allot_records.append(
-                    {
-                        "round_no": round_no,
-                        "rank": row["rank"],
-                        "user_id": row["user_id"],
-                        "allotted_center": "NOT ALLOTTED (NO SEAT)",
-                        "venueno": "",
-                        "pref1": row["pref1"],
-                        "pref2": row["pref2"],
-                        "pref3": row["pref3"],
-                        "source": "AUTO",
-                    }
-                )
-            else:
-                allot_records.append(
-                    {
-                        "round_no": round_no,
-                        "rank": row["rank"],
-                        "user_id": row["user_id"],
-                        "allotted_center": allotted_center,
-                        "venueno": assigned_venue,
-                        "pref1": row["pref1"],
-                        "pref2": row["pref2"],
-                        "pref3": row["pref3"],
-                        "source": "AUTO",
-                    }
-                )
-
-        final_allot_df = pd.DataFrame(allot_records)
-
         st.markdown("### ✅ Final Main Allotment Result")
         st.dataframe(
             final_allot_df.sort_values(by=["round_no", "rank"]),
@@ -426,28 +500,41 @@ if mode == "Admin - Allotment":
         )
 
         # ---------- SAVE ALLOTMENT TO DISK / SESSION ---------- #
-        round_file = os.path.join(DATA_DIR, f"allotments_round_{round_no}.csv")
-        final_allot_df.to_csv(round_file, index=False)
-
-        latest_file = os.path.join(DATA_DIR, "allotments_latest.csv")
-        final_allot_df.to_csv(latest_file, index=False)
+        # Only rewritten when the result changed (reruns with the same
+        # main_key skip even the fingerprint); writes are atomic so the user
+        # portal never reads a half-written file
+        round_name = f"allotments_round_{round_no}"
+        if save_if_new(
+            round_name, main_key, lambda: store.save(round_name, final_allot_df)
+        ):
+            save_locked_round(store, round_no, final_allot_df)
+        # Inputs of the round, kept alongside its allotment. Saved on their
+        # own upload digests: a re-upload that only fixes emails leaves the
+        # allotment unchanged, but slip email jobs read recipients from here
+        users_name = f"users_round_{round_no}"
+        save_if_new(users_name, users_digest, lambda: store.save(users_name, users_df))
+        centers_name = f"centers_round_{round_no}"
+        save_if_new(
+            centers_name, center_digest, lambda: store.save(centers_name, center_df)
+        )
+        if save_if_new(
+            "allotments_latest",
+            main_key,
+            lambda: publish(store, "allotments_latest", final_allot_df),
+        ):
+            get_published_cache().invalidate("allotments_latest")
+            prune_slip_cache()
 
         st.session_state["final_allot_df"] = final_allot_df
 
         # ------------------ 📈 LIVE DASHBOARD ------------------ #
+        # Rendered from the engine's counters (O(centers)), not the rows
         st.markdown("## 📈 Live Dashboard (Main)")
 
-        total_users = len(final_allot_df)
-        total_allotted = (
-            final_allot_df["allotted_center"]
-            .astype(str)
-            .apply(
-                lambda x: not x.startswith("NOT")
-                and x not in ["EXCLUDED_THIS_ROUND", "MANUAL-FAILED"]
-            )
-            .sum()
-        )
-        total_excluded = (final_allot_df["source"] == "EXCLUDED").sum()
+        outcomes = main_summary.outcomes
+        total_users = int(outcomes.sum())
+        total_allotted = int(outcomes[ALLOTTED])
+        total_excluded = int(outcomes[EXCLUDED])
 
         col_kpi1, col_kpi2, col_kpi3 = st.columns(3)
         with col_kpi1:
@@ -459,13 +546,9 @@ if mode == "Admin - Allotment":
 
         st.markdown("#### Center-wise Allotment Count")
         center_usage = (
-            final_allot_df[
-                final_allot_df["allotted_center"].astype(str).str.startswith("NOT")
-                == False
-            ]
-            .groupby("allotted_center")
-            .size()
-            .reset_index(name="count")
+            main_summary.centers.loc[lambda df: df["used"] > 0]
+            .rename(columns={"center_code": "allotted_center", "used": "count"})
+            .loc[:, ["allotted_center", "count"]]
         )
 
         if not center_usage.empty:
@@ -473,42 +556,29 @@ if mode == "Admin - Allotment":
 
         st.markdown("#### Allotment Outcome Distribution")
         outcome_dist = (
-            final_allot_df["allotted_center"]
-            .value_counts()
-            .reset_index()
+            pd.concat(
+                [
+                    main_summary.centers.set_index("center_code")["used"],
+                    outcomes.drop(ALLOTTED).rename(UNALLOTTED_CENTERS),
+                ]
+            )
+            .loc[lambda counts: counts > 0]
+            .sort_values(ascending=False, kind="stable")
+            .rename_axis("allotted_center")
+            .reset_index(name="count")
         )
-        outcome_dist.columns = ["allotted_center", "count"]
         st.dataframe(outcome_dist, use_container_width=True)
 
         # ------------------ CAPACITY SUMMARY (aggregate per center) ------------------ #
         st.markdown("## 📊 Capacity Usage Summary (Main)")
 
-        used_counts = final_allot_df[
-            final_allot_df["allotted_center"].astype(str).str.startswith("NOT") == False
-        ]
-        used_counts = (
-            used_counts.groupby("allotted_center").size().reset_index(name="used")
-        )
-
-        cap_summary = (
-            center_df.groupby("center_code")["capacity"]
-            .sum()
-            .reset_index()
-            .rename(columns={"center_code": "center_code", "capacity": "capacity"})
-        )
-
-        cap_summary = cap_summary.merge(
-            used_counts,
-            how="left",
-            left_on="center_code",
-            right_on="allotted_center",
-        ).drop(columns=["allotted_center"])
-
-        cap_summary["used"] = cap_summary["used"].fillna(0).astype(int)
-        cap_summary["remaining"] = cap_summary["capacity"] - cap_summary["used"]
+        cap_summary = main_summary.centers
 
         st.dataframe(cap_summary, use_container_width=True)
 
+        with st.expander("Venue-wise usage (Main)", expanded=False):
+            st.dataframe(main_summary.venues, use_container_width=True)
+
         # ------------------ DOWNLOAD BUTTONS ------------------ #
         st.markdown("## ⬇ Download Main Allotment Data")
 
@@ -546,11 +616,12 @@ if mode == "Admin - Allotment":
         )
 
         if lab_file is not None:
-            # Read lab venue file
-            if lab_file.name.endswith(".csv"):
-                lab_df = pd.read_csv(lab_file)
-            else:
-                lab_df = pd.read_excel(lab_file)
+            # Read lab venue file (cached on file content)
+            lab_digest = upload_digest(lab_file)
+            lab_df, lab_stats = read_upload(
+                lab_digest, lab_file.name, "labs", lab_file.getvalue()
+            )
+            st.caption(f"Labs: {format_stats(lab_stats)}")
 
             st.markdown("### 🧪 Lab / Venue Data (CC)")
             st.dataframe(lab_df, use_container_width=True)
@@ -562,11 +633,6 @@ if mode == "Admin - Allotment":
                     st.error(f"❌ Lab venue file missing required column: **{col}**")
                     st.stop()
 
-            # Normalize types
-            lab_df["collegecode"] = lab_df["collegecode"].astype(str)
-            lab_df["venueno"] = lab_df["venueno"].astype(str)
-            lab_df["tempvno"] = lab_df["tempvno"].astype(int)
-
             # CC round number (separate from main round)
             cc_round_no = st.number_input(
                 "CC Allotment Round Number",
@@ -580,110 +646,47 @@ if mode == "Admin - Allotment":
                 "Send CC duty slips via email (use same SMTP settings)", value=False
             )
 
-            # Build remaining capacity per (collegecode, venueno)
-            cc_capacity = {}
-            for _, r in lab_df.iterrows():
-                key = (r["collegecode"], r["venueno"])
-                cc_capacity[key] = cc_capacity.get(key, 0) + int(r["tempvno"])
-
-            cc_remaining = cc_capacity.copy()
-
-            # Eligible users = those with a valid exam center allotment
-            valid_exam = final_allot_df[
-                final_allot_df["allotted_center"].astype(str).str.startswith("NOT")
-                == False
-            ]
-            valid_exam = valid_exam[
-                ~valid_exam["allotted_center"].isin(
-                    ["EXCLUDED_THIS_ROUND", "MANUAL-FAILED"]
-                )
-            ]
+            # Eligible users = those with a valid exam center allotment,
+            # allotted labs in exam rank order (same priority order)
+            cc_key = (main_key, lab_digest, int(cc_round_no))
+            cc_allot_df, cc_summary = compute_cc_allotment(
+                *cc_key, engine, final_allot_df, lab_df
+            )
 
-            if valid_exam.empty:
+            if cc_allot_df.empty:
                 st.warning("No candidates with valid exam center allotment for CC.")
             else:
-                # Sort by exam rank (same priority order)
-                valid_exam = valid_exam.sort_values(by="rank")
-
-                # Map user_id → email (if exists)
-                email_map_cc = {}
-                if cc_email_enabled and "email" in users_df.columns:
-                    tmp_users_cc = users_df.copy()
-                    tmp_users_cc["user_id"] = tmp_users_cc["user_id"].astype(str)
-                    email_map_cc = dict(
-                        zip(tmp_users_cc["user_id"], tmp_users_cc["email"])
-                    )
-                elif cc_email_enabled and "email" not in users_df.columns:
+                # Emails come from the round's saved users file
+                if cc_email_enabled and "email" not in users_df.columns:
                     st.warning(
                         "Users file has no 'email' column; CC emails cannot be sent."
                     )
                     cc_email_enabled = False
 
-                # Process CC allotment
-                cc_allot_records = []
-
-                for _, row in valid_exam.iterrows():
-                    uid = str(row["user_id"])
-                    college = str(row["allotted_center"])  # must match collegecode
-
-                    # Find any venue under this college with remaining capacity
-                    possible_venues = [
-                        key
-                        for key, cap in cc_remaining.items()
-                        if key[0] == college and cap > 0
-                    ]
-
-                    if possible_venues:
-                        # Simple: choose smallest venueno for stability
-                        chosen_key = sorted(possible_venues, key=lambda x: x[1])[0]
-                        cc_remaining[chosen_key] -= 1
-                        chosen_venue = chosen_key[1]
-                    else:
-                        chosen_venue = "NO_LAB_SEAT"
-
-                    cc_allot_records.append(
-                        {
-                            "cc_round_no": cc_round_no,
-                            "round_no": row["round_no"],
-                            "rank": row["rank"],
-                            "user_id": row["user_id"],
-                            "exam_center": row["allotted_center"],
-                            "cc_venueno": chosen_venue,
-                            "pref1": row["pref1"],
-                            "pref2": row["pref2"],
-                            "pref3": row["pref3"],
-                            "source": "CC-AUTO",
-                        }
-                    )
-
-                cc_allot_df = pd.DataFrame(cc_allot_records)
-
                 st.markdown("### ✅ CC / Lab Allotment Result")
                 st.dataframe(
                     cc_allot_df.sort_values(by=["cc_round_no", "rank"]),
                     use_container_width=True,
                 )
 
-                # Save CC allotment to disk
-                cc_round_file = os.path.join(
-                    DATA_DIR, f"cc_allotments_round_{cc_round_no}.csv"
-                )
-                cc_allot_df.to_csv(cc_round_file, index=False)
-
-                cc_latest_file = os.path.join(DATA_DIR, "cc_allotments_latest.csv")
-                cc_allot_df.to_csv(cc_latest_file, index=False)
+                # Save CC allotment to disk (only when changed, atomically)
+                cc_name = f"cc_allotments_round_{cc_round_no}"
+                save_if_new(cc_name, cc_key, lambda: store.save(cc_name, cc_allot_df))
+                if save_if_new(
+                    "cc_allotments_latest",
+                    cc_key,
+                    lambda: publish(store, "cc_allotments_latest", cc_allot_df),
+                ):
+                    get_published_cache().invalidate("cc_allotments_latest")
+                    prune_slip_cache()
 
                 # CC capacity summary
                 st.markdown("### 📊 CC Capacity Usage Summary")
 
-                used_cc = cc_allot_df[
-                    cc_allot_df["cc_venueno"].astype(str) != "NO_LAB_SEAT"
-                ]
-                used_cc_counts = (
-                    used_cc.groupby(["exam_center", "cc_venueno"])
-                    .size()
-                    .reset_index(name="used")
-                )
+                # Seats used per lab venue, from the engine's counters
+                used_cc_counts = cc_summary.venues.rename(
+                    columns={"center_code": "exam_center", "venueno": "cc_venueno"}
+                )[["exam_center", "cc_venueno", "used"]]
 
                 lab_df_for_merge = lab_df.rename(
                     columns={
@@ -733,133 +736,31 @@ if mode == "Admin - Allotment":
 
                 if cc_generate_pdf:
                     try:
-                        from reportlab.lib.pagesizes import A4
-                        from reportlab.pdfgen import canvas
-
-                        # Combined CC PDF for admin
-                        cc_combined_buffer = io.BytesIO()
-                        cc_canvas = canvas.Canvas(cc_combined_buffer, pagesize=A4)
-                        width, height = A4
-
-                        for _, row in cc_allot_df.iterrows():
-                            if str(row["cc_venueno"]) == "NO_LAB_SEAT":
-                                continue
-
-                            # Add page in combined CC PDF
-                            cc_canvas.setFont("Helvetica-Bold", 16)
-                            cc_canvas.drawString(50, height - 60, "CC / Lab Duty Slip")
-
-                            cc_canvas.setFont("Helvetica", 12)
-                            cc_canvas.drawString(
-                                50, height - 100, f"CC Round No: {row['cc_round_no']}"
-                            )
-                            cc_canvas.drawString(
-                                50,
-                                height - 120,
-                                f"User ID: {row['user_id']}",
-                            )
-                            cc_canvas.drawString(
-                                50,
-                                height - 140,
-                                f"Exam Center (College): {row['exam_center']}",
-                            )
-                            cc_canvas.drawString(
-                                50,
-                                height - 160,
-                                f"Lab / Venue No: {row['cc_venueno']}",
-                            )
-                            cc_canvas.drawString(
-                                50,
-                                height - 190,
-                                f"Preference Order: {row['pref1']}, {row['pref2']}, {row['pref3']}",
-                            )
-                            cc_canvas.drawString(
-                                50,
-                                height - 220,
-                                "Please report to the allotted lab as per schedule.",
+                        # Individual CC emails (sent by the job after the PDF)
+                        cc_email = None
+                        if cc_email_enabled and smtp_ready:
+                            cc_email = email_job_args(
+                                f"cc:{round_no}:{cc_round_no}:",
+                                f"users_round_{round_no}",
+                                "CC / Lab Duty Slip",
+                                (
+                                    "Dear Candidate,\n\n"
+                                    "Please find your CC / Lab duty slip attached.\n\n"
+                                    "Regards,\nExam Cell"
+                                ),
+                                "cc_duty_slip_",
                             )
-                            cc_canvas.showPage()
-
-                            # Individual CC email
-                            if cc_email_enabled and smtp_host and smtp_user and smtp_pass:
-                                uid = str(row["user_id"])
-                                user_email = email_map_cc.get(uid)
-                                if user_email:
-                                    try:
-                                        indiv_buffer = io.BytesIO()
-                                        c2 = canvas.Canvas(
-                                            indiv_buffer, pagesize=A4
-                                        )
-                                        c2.setFont("Helvetica-Bold", 16)
-                                        c2.drawString(
-                                            50, height - 60, "CC / Lab Duty Slip"
-                                        )
-                                        c2.setFont("Helvetica", 12)
-                                        c2.drawString(
-                                            50,
-                                            height - 100,
-                                            f"CC Round No: {row['cc_round_no']}",
-                                        )
-                                        c2.drawString(
-                                            50,
-                                            height - 120,
-                                            f"User ID: {row['user_id']}",
-                                        )
-                                        c2.drawString(
-                                            50,
-                                            height - 140,
-                                            f"Exam Center (College): {row['exam_center']}",
-                                        )
-                                        c2.drawString(
-                                            50,
-                                            height - 160,
-                                            f"Lab / Venue No: {row['cc_venueno']}",
-                                        )
-                                        c2.drawString(
-                                            50,
-                                            height - 190,
-                                            f"Preference Order: {row['pref1']}, {row['pref2']}, {row['pref3']}",
-                                        )
-                                        c2.drawString(
-                                            50,
-                                            height - 220,
-                                            "Please report to the allotted lab as per schedule.",
-                                        )
-                                        c2.showPage()
-                                        c2.save()
-                                        indiv_buffer.seek(0)
-
-                                        subject = "CC / Lab Duty Slip"
-                                        body = (
-                                            "Dear Candidate,\n\n"
-                                            "Please find your CC / Lab duty slip attached.\n\n"
-                                            "Regards,\nExam Cell"
-                                        )
-
-                                        send_email_with_attachment(
-                                            user_email,
-                                            subject,
-                                            body,
-                                            indiv_buffer.getvalue(),
-                                            f"cc_duty_slip_{uid}.pdf",
-                                            smtp_host,
-                                            smtp_port,
-                                            smtp_user,
-                                            smtp_pass,
-                                        )
-                                    except Exception as ee:
-                                        st.warning(
-                                            f"Failed to send CC email to {uid}: {ee}"
-                                        )
-
-                        cc_canvas.save()
-                        cc_combined_buffer.seek(0)
-
-                        st.download_button(
-                            label="Download CC Duty Slips PDF (Admin)",
-                            data=cc_combined_buffer.getvalue(),
-                            file_name=f"cc_duty_slips_round_{cc_round_no}.pdf",
-                            mime="application/pdf",
+
+                        # Combined CC PDF (or per-center ZIP) for admin,
+                        # rendered in parallel shards on disk in the background
+                        submit_slip_job(
+                            f"CC duty slips, CC round {cc_round_no}",
+                            cc_name,
+                            "cc",
+                            f"cc_duty_slips_round_{cc_round_no}",
+                            "exam_center",
+                            slip_layout,
+                            email=cc_email,
                         )
 
                     except Exception as e:
@@ -877,144 +778,37 @@ if mode == "Admin - Allotment":
 
         if generate_pdf:
             try:
-                from reportlab.lib.pagesizes import A4
-                from reportlab.pdfgen import canvas
-
                 # Email column check if needed
                 if enable_email and "email" not in users_df.columns:
                     st.error("Users file does not have an 'email' column. Cannot send emails.")
                     enable_email = False
 
-                # Map user_id -> email
-                email_map = {}
-                if enable_email:
-                    tmp_users = users_df.copy()
-                    tmp_users["user_id"] = tmp_users["user_id"].astype(str)
-                    email_map = dict(zip(tmp_users["user_id"], tmp_users["email"]))
-
-                # -------------- Combined PDF (download for admin) -------------- #
-                combined_buffer = io.BytesIO()
-                combined_canvas = canvas.Canvas(combined_buffer, pagesize=A4)
-                width, height = A4
-
-                for _, row in final_allot_df.iterrows():
-                    # Skip non-allotted users
-                    if (
-                        str(row["allotted_center"]).startswith("NOT")
-                        or row["allotted_center"]
-                        in ["EXCLUDED_THIS_ROUND", "MANUAL-FAILED"]
-                    ):
-                        continue
-
-                    # Draw page for combined PDF
-                    combined_canvas.setFont("Helvetica-Bold", 16)
-                    combined_canvas.drawString(50, height - 60, "Exam Duty Slip")
-                    combined_canvas.setFont("Helvetica", 12)
-                    combined_canvas.drawString(
-                        50, height - 100, f"Round No: {row['round_no']}"
-                    )
-                    combined_canvas.drawString(
-                        50, height - 120, f"User ID: {row['user_id']}"
-                    )
-                    combined_canvas.drawString(
-                        50,
-                        height - 140,
-                        f"Allotted Center: {row['allotted_center']}",
-                    )
-                    # Venue display
-                    combined_canvas.drawString(
-                        50,
-                        height - 160,
-                        f"Venue No: {row.get('venueno', '')}",
+                # -------------- Individual PDF (email only) -------------- #
+                exam_email = None
+                if enable_email and smtp_ready:
+                    exam_email = email_job_args(
+                        f"exam:{round_no}:",
+                        f"users_round_{round_no}",
+                        "Exam Duty Slip",
+                        (
+                            "Dear Candidate,\n\n"
+                            "Please find your exam duty slip attached.\n\n"
+                            "Regards,\nExam Cell"
+                        ),
+                        "duty_slip_",
                     )
-                    combined_canvas.drawString(
-                        50,
-                        height - 190,
-                        f"Preference Order: {row['pref1']}, {row['pref2']}, {row['pref3']}",
-                    )
-                    combined_canvas.drawString(
-                        50,
-                        height - 220,
-                        "Please report to the allotted center as per schedule.",
-                    )
-                    combined_canvas.showPage()
-
-                    # -------------- Individual PDF (email only) -------------- #
-                    if enable_email and smtp_host and smtp_user and smtp_pass:
-                        uid = str(row["user_id"])
-                        user_email = email_map.get(uid)
-
-                        if user_email:
-                            try:
-                                indiv_buffer = io.BytesIO()
-                                c2 = canvas.Canvas(indiv_buffer, pagesize=A4)
-
-                                c2.setFont("Helvetica-Bold", 16)
-                                c2.drawString(50, height - 60, "Exam Duty Slip")
-                                c2.setFont("Helvetica", 12)
-                                c2.drawString(
-                                    50,
-                                    height - 100,
-                                    f"Round No: {row['round_no']}",
-                                )
-                                c2.drawString(
-                                    50,
-                                    height - 120,
-                                    f"User ID: {row['user_id']}",
-                                )
-                                c2.drawString(
-                                    50,
-                                    height - 140,
-                                    f"Allotted Center: {row['allotted_center']}",
-                                )
-                                c2.drawString(
-                                    50,
-                                    height - 160,
-                                    f"Venue No: {row.get('venueno', '')}",
-                                )
-                                c2.drawString(
-                                    50,
-                                    height - 190,
-                                    f"Preference Order: {row['pref1']}, {row['pref2']}, {row['pref3']}",
-                                )
-                                c2.drawString(
-                                    50,
-                                    height - 220,
-                                    "Please report to the allotted center as per schedule.",
-                                )
-                                c2.showPage()
-                                c2.save()
-                                indiv_buffer.seek(0)
 
-                                subject = "Exam Duty Slip"
-                                body = (
-                                    "Dear Candidate,\n\n"
-                                    "Please find your exam duty slip attached.\n\n"
-                                    "Regards,\nExam Cell"
-                                )
-
-                                send_email_with_attachment(
-                                    user_email,
-                                    subject,
-                                    body,
-                                    indiv_buffer.getvalue(),
-                                    f"duty_slip_{uid}.pdf",
-                                    smtp_host,
-                                    smtp_port,
-                                    smtp_user,
-                                    smtp_pass,
-                                )
-                            except Exception as ee:
-                                st.warning(f"Failed to send email to {uid}: {ee}")
-
-                combined_canvas.save()
-                combined_buffer.seek(0)
-
-                st.download_button(
-                    label="Download Exam Duty Slips PDF (Admin)",
-                    data=combined_buffer.getvalue(),
-                    file_name=f"duty_slips_round_{round_no}.pdf",
-                    mime="application/pdf",
+                # -------------- Combined PDF (download for admin) -------------- #
+                # Rendered in parallel shards on disk by a background job:
+                # one merged PDF or a ZIP with one PDF per allotted center
+                submit_slip_job(
+                    f"Exam duty slips, round {round_no}",
+                    round_name,
+                    "exam",
+                    f"duty_slips_round_{round_no}",
+                    "allotted_center",
+                    slip_layout,
+                    email=exam_email,
                 )
 
             except Exception as e:
@@ -1040,85 +834,40 @@ if mode == "User - View Duty Slip":
     # ------------------ MAIN EXAM SLIP ------------------ #
     st.markdown("### 🎫 Main Exam Duty Slip")
 
-    latest_file = os.path.join(DATA_DIR, "allotments_latest.csv")
     exam_row = None
-    if not os.path.exists(latest_file):
+    if not store.exists("allotments_latest"):
         st.warning("Main exam allotment not yet published.")
     else:
-        latest_df = pd.read_csv(latest_file)
-
         if st.button("Fetch My Allotment (Main + CC)"):
             if not user_id_input:
                 st.error("Please enter your User ID.")
             else:
-                rows = latest_df[latest_df["user_id"].astype(str) == user_id_input]
-                if rows.empty:
+                # Primary-key lookup in the index built at publish time,
+                # through the process-wide cache (reloads when republished)
+                exam_record = get_published_cache().lookup(
+                    "allotments_latest", user_id_input
+                )
+                if exam_record is None:
                     st.error("No main exam record found for this User ID.")
                 else:
-                    exam_row = rows.iloc[0]
+                    exam_row = pd.Series(exam_record)
                     st.success(f"Main exam allotment found for User ID: {user_id_input}")
                     st.write(exam_row)
 
-                    if str(exam_row["allotted_center"]).startswith("NOT") or exam_row[
-                        "allotted_center"
-                    ] in ["EXCLUDED_THIS_ROUND", "MANUAL-FAILED"]:
+                    if "status" in exam_record:
+                        allotted = exam_record["status"] == ALLOTTED
+                    else:
+                        # Published before the status column existed
+                        allotted = is_allotted(pd.DataFrame([exam_record])).iloc[0]
+                    if not allotted:
                         st.warning(
                             "You have not been allotted any main exam center in this round."
                         )
                     else:
                         try:
-                            from reportlab.lib.pagesizes import A4
-                            from reportlab.pdfgen import canvas
-
-                            buffer = io.BytesIO()
-                            c = canvas.Canvas(buffer, pagesize=A4)
-                            width, height = A4
-
-                            c.setFont("Helvetica-Bold", 16)
-                            c.drawString(50, height - 60, "Exam Duty Slip")
-
-                            c.setFont("Helvetica", 12)
-                            c.drawString(
-                                50,
-                                height - 100,
-                                f"Round No: {exam_row['round_no']}",
-                            )
-                            c.drawString(
-                                50,
-                                height - 120,
-                                f"User ID: {exam_row['user_id']}",
-                            )
-                            c.drawString(
-                                50,
-                                height - 140,
-                                f"Allotted Center: {exam_row['allotted_center']}",
-                            )
-                            # Venue display in user PDF
-                            if "venueno" in exam_row:
-                                c.drawString(
-                                    50,
-                                    height - 160,
-                                    f"Venue No: {exam_row.get('venueno', '')}",
-                                )
-
-                            c.drawString(
-                                50,
-                                height - 190,
-                                f"Preference Order: {exam_row['pref1']}, {exam_row['pref2']}, {exam_row['pref3']}",
-                            )
-                            c.drawString(
-                                50,
-                                height - 220,
-                                "Please report to the allotted center as per schedule.",
-                            )
-
-                            c.showPage()
-                            c.save()
-                            buffer.seek(0)
-
                             st.download_button(
                                 label="Download My Exam Duty Slip (PDF)",
-                                data=buffer.getvalue(),
+                                data=get_slip_cache().get("exam", exam_row),
                                 file_name=f"duty_slip_{user_id_input}.pdf",
                                 mime="application/pdf",
                             )
@@ -1128,76 +877,30 @@ if mode == "User - View Duty Slip":
                 # ------------------ CC / LAB SLIP ------------------ #
                 st.markdown("### 💻 CC / Lab Duty Slip")
 
-                cc_latest_file = os.path.join(DATA_DIR, "cc_allotments_latest.csv")
-                if not os.path.exists(cc_latest_file):
+                if not store.exists("cc_allotments_latest"):
                     st.warning("CC / Lab allotment not yet published.")
                 else:
-                    cc_df = pd.read_csv(cc_latest_file)
-                    cc_rows = cc_df[cc_df["user_id"].astype(str) == user_id_input]
-                    if cc_rows.empty:
+                    cc_record = get_published_cache().lookup(
+                        "cc_allotments_latest", user_id_input
+                    )
+                    if cc_record is None:
                         st.warning("No CC / Lab record found for this User ID.")
                     else:
-                        cc_row = cc_rows.iloc[0]
+                        cc_row = pd.Series(cc_record)
                         st.success(
                             f"CC / Lab allotment found for User ID: {user_id_input}"
                         )
                         st.write(cc_row)
 
-                        if str(cc_row["cc_venueno"]) == "NO_LAB_SEAT":
+                        if str(cc_row["cc_venueno"]) == NO_LAB_SEAT:
                             st.warning(
                                 "You do not have a CC / Lab seat in the current CC round."
                             )
                         else:
                             try:
-                                from reportlab.lib.pagesizes import A4
-                                from reportlab.pdfgen import canvas
-
-                                buffer_cc = io.BytesIO()
-                                c3 = canvas.Canvas(buffer_cc, pagesize=A4)
-                                width, height = A4
-
-                                c3.setFont("Helvetica-Bold", 16)
-                                c3.drawString(50, height - 60, "CC / Lab Duty Slip")
-
-                                c3.setFont("Helvetica", 12)
-                                c3.drawString(
-                                    50,
-                                    height - 100,
-                                    f"CC Round No: {cc_row['cc_round_no']}",
-                                )
-                                c3.drawString(
-                                    50,
-                                    height - 120,
-                                    f"User ID: {cc_row['user_id']}",
-                                )
-                                c3.drawString(
-                                    50,
-                                    height - 140,
-                                    f"Exam Center (College): {cc_row['exam_center']}",
-                                )
-                                c3.drawString(
-                                    50,
-                                    height - 160,
-                                    f"Lab / Venue No: {cc_row['cc_venueno']}",
-                                )
-                                c3.drawString(
-                                    50,
-                                    height - 190,
-                                    f"Preference Order: {cc_row['pref1']}, {cc_row['pref2']}, {cc_row['pref3']}",
-                                )
-                                c3.drawString(
-                                    50,
-                                    height - 220,
-                                    "Please report to the allotted lab as per schedule.",
-                                )
-
-                                c3.showPage()
-                                c3.save()
-                                buffer_cc.seek(0)
-
                                 st.download_button(
                                     label="Download My CC / Lab Duty Slip (PDF)",
-                                    data=buffer_cc.getvalue(),
+                                    data=get_slip_cache().get("cc", cc_row),
                                     file_name=f"cc_duty_slip_{user_id_input}.pdf",
                                     mime="application/pdf",
                                 )
@@ -0,0 +1,187 @@
+"""Typed loading of the uploaded users / centers / lab files (no streamlit).
+
+CSV goes through pyarrow's multithreaded reader when installed, with code
+columns forced to text instead of inferred per file.
+Center, lab and preference codes are canonicalized the same way in every
+file ("101", "0101", 101, 101.0 and " 101.0 " all become "101", as when
+codes were read as numbers) and kept as categoricals, and `created_at` is
+read as text and parsed with one format guessed from the data instead of
+per-row inference.
+"""
+import io
+import time
+import warnings
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+from pandas.tseries.api import guess_datetime_format
+
+# Per file kind: text columns, code columns (canonicalized), datetime columns
+USERS = {
+    "text": ["user_id", "email"],
+    "codes": ["pref1", "pref2", "pref3"],
+    "datetimes": ["created_at"],
+}
+CENTERS = {"text": ["venueno"], "codes": ["center_code"], "datetimes": []}
+LABS = {"text": ["venueno"], "codes": ["collegecode"], "datetimes": []}
+
+LoadStats = namedtuple("LoadStats", "rows nbytes seconds")
+
+
+def format_stats(stats: LoadStats) -> str:
+    """e.g. "120,000 rows, 4.1 MB in 0.21 s (571,428 rows/s)"."""
+    rate = stats.rows / stats.seconds if stats.seconds else float("inf")
+    return (
+        f"{stats.rows:,} rows, {stats.nbytes / 1e6:.1f} MB in "
+        f"{stats.seconds:.2f} s ({rate:,.0f} rows/s)"
+    )
+
+
+# ------------------ CODES / DATES ------------------ #
+def canonical_codes(values: pd.Series) -> pd.Series:
+    """Codes as a categorical of canonical strings; missing values stay NaN.
+
+    All-digit codes lose leading zeros and a ".0" suffix, so "0101" in one
+    file matches 101 in another. Works per distinct value (factorize), so
+    it is cheap on large files.
+    """
+    codes, uniques = pd.factorize(values)
+    canon = (
+        pd.Index(uniques, dtype=object)
+        .astype(str)
+        .str.strip()
+        .str.replace(r"^([+-]?)0*(\d+)(?:\.0*)?$", r"\1\2", regex=True)
+    )
+    # Distinct raw values can share a canonical form ("101" / "0101.0")
+    canon_codes, categories = pd.factorize(canon)
+    # Trailing -1 so missing values (code -1) stay missing
+    lookup = np.append(canon_codes, -1).astype(np.int32)
+    return pd.Series(
+        pd.Categorical.from_codes(lookup[codes], categories=categories),
+        index=values.index,
+        name=values.name,
+    )
+
+
+def _guess_formats(value: str):
+    """Formats `value` may follow: the month-first guess, then day-first."""
+    with warnings.catch_warnings():
+        # Day-first guesses are fine: the format is checked on every value
+        warnings.simplefilter("ignore", UserWarning)
+        guesses = [
+            guess_datetime_format(value),
+            guess_datetime_format(value, dayfirst=True),
+        ]
+    return [fmt for i, fmt in enumerate(guesses) if fmt and fmt not in guesses[:i]]
+
+
+def _strptime(values: pd.Series, fmt: str) -> pd.Series:
+    """pyarrow's vectorized strptime; None when pyarrow is missing or a
+    value doesn't follow `fmt`.
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.compute as pc
+    except ImportError:
+        return None
+
+    try:
+        parsed = pc.strptime(
+            pa.array(values, type=pa.string(), from_pandas=True),
+            format=fmt,
+            unit="us",
+        )
+    except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+        # e.g. fractional seconds; let pandas try the same format
+        return None
+    return pd.Series(
+        parsed.to_numpy(zero_copy_only=False), index=values.index, name=values.name
+    )
+
+
+def parse_datetimes(values: pd.Series) -> pd.Series:
+    """Parse text with one format guessed from the first value.
+
+    Uses pyarrow's vectorized strptime when available. A day-first format
+    is tried when the month-first guess doesn't fit every value. Falls back
+    to pandas' per-value inference when no format fits, and to
+    `pd.to_datetime` for non-text input (e.g. dates read from Excel).
+    """
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values
+    if not pd.api.types.is_string_dtype(values):
+        return pd.to_datetime(values)
+    first = values.dropna()
+    formats = _guess_formats(str(first.iloc[0])) if len(first) else []
+
+    for fmt in formats:
+        parsed = _strptime(values, fmt)
+        if parsed is not None:
+            return parsed
+    for fmt in formats:
+        try:
+            return pd.to_datetime(values, format=fmt)
+        except (ValueError, TypeError):
+            pass
+    # Per-value inference, e.g. "2025-01-08 20:33" next to "2025-01-08T21:00"
+    return pd.to_datetime(values, format="mixed")
+
+
+# ------------------ READERS ------------------ #
+def _read_csv(data: bytes, text_columns) -> pd.DataFrame:
+    if not data.strip():
+        # No header either; the caller's column checks report it
+        return pd.DataFrame()
+    try:
+        import pyarrow as pa
+        from pyarrow import csv as pa_csv
+    except ImportError:
+        return pd.read_csv(
+            io.BytesIO(data), dtype={col: str for col in text_columns}
+        )
+
+    table = pa_csv.read_csv(
+        io.BytesIO(data),
+        convert_options=pa_csv.ConvertOptions(
+            column_types={col: pa.string() for col in text_columns},
+            strings_can_be_null=True,
+        ),
+    )
+    return table.to_pandas()
+
+
+def _read_excel(data: bytes, text_columns) -> pd.DataFrame:
+    # openpyxl is opened read-only (streaming rows) by pandas
+    return pd.read_excel(
+        io.BytesIO(data),
+        engine="openpyxl",
+        dtype={col: str for col in text_columns},
+    )
+
+
+def load_table(data: bytes, name: str, schema: dict):
+    """Parse an uploaded CSV/XLSX per `schema` (USERS / CENTERS / LABS).
+
+    Returns `(df, LoadStats)`. Columns not in the schema keep inferred types.
+    """
+    start = time.perf_counter()
+    text_columns = schema["text"] + schema["codes"]
+    if name.endswith(".csv"):
+        # Datetimes as text too: pyarrow would turn date-only values into
+        # `date` objects, which `parse_datetimes` then can't strptime
+        df = _read_csv(data, text_columns + schema["datetimes"])
+    else:
+        df = _read_excel(data, text_columns)
+
+    for col in schema["codes"]:
+        if col in df.columns:
+            df[col] = canonical_codes(df[col])
+    for col in schema["text"]:
+        if col in df.columns:
+            df[col] = df[col].str.strip()
+    for col in schema["datetimes"]:
+        if col in df.columns:
+            df[col] = parse_datetimes(df[col])
+
+    return df, LoadStats(len(df), len(data), time.perf_counter() - start)
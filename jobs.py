@@ -0,0 +1,384 @@
+"""Background jobs for long admin operations (no streamlit import).
+
+Jobs run on a process pool and record status, progress, timings and their
+output file (artifact) in a SQLite job table, so the admin page only
+submits and polls: a page reload or dropped browser session doesn't lose
+the work, and other sessions aren't blocked while it runs.
+"""
+import multiprocessing
+import os
+import shutil
+import sqlite3
+import time
+import traceback
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
+# Minimum seconds between progress writes from a running job
+PROGRESS_INTERVAL = 0.5
+
+# Owner of the jobs submitted from this process: pid plus a per-process id,
+# so a later process that happens to get the same pid isn't mistaken for it
+OWNER = f"{os.getpid()}:{uuid.uuid4().hex[:12]}"
+
+
+# ------------------ JOB TABLE ------------------ #
+class JobStore:
+    """Job rows in a SQLite file; safe to open from any process."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._db = sqlite3.connect(path, timeout=30)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            """CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                label TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'queued',
+                done INTEGER NOT NULL DEFAULT 0,
+                total INTEGER NOT NULL DEFAULT 0,
+                message TEXT,
+                artifact TEXT,
+                mime TEXT,
+                error TEXT,
+                created_at REAL,
+                started_at REAL,
+                finished_at REAL,
+                owner TEXT
+            )"""
+        )
+        columns = {row["name"] for row in self._db.execute("PRAGMA table_info(jobs)")}
+        if "owner" not in columns:
+            self._db.execute("ALTER TABLE jobs ADD COLUMN owner TEXT")
+        self._db.commit()
+
+    def create(self, kind: str, label: str, owner: str = OWNER) -> str:
+        job_id = uuid.uuid4().hex[:12]
+        self._db.execute(
+            "INSERT INTO jobs (id, kind, label, created_at, owner) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (job_id, kind, label, time.time(), owner),
+        )
+        self._db.commit()
+        return job_id
+
+    def update(self, job_id: str, **fields) -> None:
+        cols = ", ".join(f"{name} = ?" for name in fields)
+        self._db.execute(
+            f"UPDATE jobs SET {cols} WHERE id = ?", (*fields.values(), job_id)
+        )
+        self._db.commit()
+
+    def get(self, job_id: str) -> dict:
+        row = self._db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return dict(row) if row else None
+
+    def recent(self, limit: int = 20):
+        """Newest jobs first, as dicts."""
+        rows = self._db.execute(
+            "SELECT * FROM jobs ORDER BY created_at DESC LIMIT ?", (limit,)
+        )
+        return [dict(row) for row in rows]
+
+    def fail_orphaned(self, reason: str) -> None:
+        """Mark queued/running jobs failed whose owner process is gone.
+
+        Jobs of live processes (other replicas sharing the table, or an
+        earlier runner of this process) are left alone.
+        """
+        rows = self._db.execute(
+            "SELECT DISTINCT owner FROM jobs WHERE status IN ('queued', 'running')"
+        )
+        gone = [owner for (owner,) in rows if not _owner_alive(owner)]
+        for owner in gone:
+            self._db.execute(
+                "UPDATE jobs SET status = 'failed', error = ?, finished_at = ? "
+                "WHERE status IN ('queued', 'running') AND owner IS ?",
+                (reason, time.time(), owner),
+            )
+        self._db.commit()
+
+    def close(self) -> None:
+        self._db.close()
+
+
+def _owner_alive(owner: str) -> bool:
+    """Whether the process of job owner `owner` (see `OWNER`) still runs."""
+    if owner is None:
+        # Jobs from before owners were recorded
+        return False
+    pid = int(owner.partition(":")[0])
+    if pid == os.getpid():
+        return owner == OWNER
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class JobContext:
+    """Handed to a job function to report progress (throttled writes)."""
+
+    def __init__(self, store: JobStore, job_id: str):
+        self.store = store
+        self.job_id = job_id
+        self._last = 0.0
+
+    def progress(self, done: int, total: int, message: str = None) -> None:
+        now = time.monotonic()
+        if done < total and now - self._last < PROGRESS_INTERVAL:
+            return
+        self._last = now
+        fields = {"done": done, "total": total}
+        if message is not None:
+            fields["message"] = message
+        self.store.update(self.job_id, **fields)
+
+
+# ------------------ RUNNER ------------------ #
+def _run_job(db_path: str, job_id: str, fn, kwargs: dict) -> None:
+    """Worker: run `fn(ctx, **kwargs)` and record its outcome.
+
+    `fn` returns None or a dict with optional "artifact", "mime", "message".
+    """
+    store = JobStore(db_path)
+    try:
+        store.update(job_id, status="running", started_at=time.time())
+        result = fn(JobContext(store, job_id), **kwargs) or {}
+        store.update(
+            job_id,
+            status="done",
+            artifact=result.get("artifact"),
+            mime=result.get("mime"),
+            message=result.get("message"),
+            finished_at=time.time(),
+        )
+    except Exception as e:
+        store.update(
+            job_id,
+            status="failed",
+            error=f"{type(e).__name__}: {e}\n{traceback.format_exc(limit=5)}",
+            finished_at=time.time(),
+        )
+    finally:
+        store.close()
+
+
+class JobRunner:
+    """Process pool + job table. Keep one per server process.
+
+    Jobs left queued/running by a server process that has exited are marked
+    failed on start-up, since nothing will finish them. Workers are spawned,
+    not forked: the server process is multi-threaded (Streamlit,
+    SQLite/MySQL connections), which a fork would copy mid-state.
+    `cpus_per_job` is each worker's share of the CPUs, for jobs that use a
+    process pool of their own.
+    """
+
+    def __init__(self, db_path: str, workers: int = 2):
+        self.db_path = db_path
+        self.cpus_per_job = max(1, (os.cpu_count() or 1) // workers)
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        with self._store() as store:
+            store.fail_orphaned("Interrupted (server restarted)")
+        self._pool = ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+        )
+
+    @contextmanager
+    def _store(self):
+        # Short-lived connections: the runner is shared between threads
+        store = JobStore(self.db_path)
+        try:
+            yield store
+        finally:
+            store.close()
+
+    def submit(self, kind: str, label: str, fn, /, **kwargs) -> str:
+        """Queue `fn(ctx, **kwargs)` (module-level, picklable); returns the job id."""
+        with self._store() as store:
+            job_id = store.create(kind, label)
+        future = self._pool.submit(_run_job, self.db_path, job_id, fn, kwargs)
+        future.add_done_callback(lambda f: self._on_crash(job_id, f))
+        return job_id
+
+    def _on_crash(self, job_id: str, future) -> None:
+        # _run_job records its own errors; this only sees a dead worker
+        if future.cancelled() or future.exception() is None:
+            return
+        with self._store() as store:
+            store.update(
+                job_id,
+                status="failed",
+                error=f"Worker crashed: {future.exception()}",
+                finished_at=time.time(),
+            )
+
+    def get(self, job_id: str) -> dict:
+        with self._store() as store:
+            return store.get(job_id)
+
+    def recent(self, limit: int = 20):
+        with self._store() as store:
+            return store.recent(limit)
+
+    def shutdown(self) -> None:
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+# ------------------ TASKS ------------------ #
+def _slip_rows(store, name, kind):
+    """Slip rows of saved allotment `name`: allotted exam / CC candidates."""
+    from allotment_engine import NO_LAB_SEAT, is_allotted
+
+    df = store.load(name)
+    if kind == "exam":
+        df = df[is_allotted(df)]
+    else:
+        df = df[df["cc_venueno"] != NO_LAB_SEAT]
+    return df.to_dict("records")
+
+
+def _recipients(store, name):
+    """{user_id: email} of the saved users frame `name` (empty emails skipped)."""
+    users = store.load(name)
+    if "email" not in users.columns:
+        raise ValueError(f"Saved users frame {name!r} has no 'email' column")
+    users = users[users["email"].notna() & (users["email"].astype(str) != "")]
+    return dict(zip(users["user_id"].astype(str), users["email"].astype(str)))
+
+
+def slip_job(
+    ctx: JobContext,
+    data_dir,
+    name,
+    kind,
+    out_path,
+    layout,
+    group_key,
+    email=None,
+    workers=None,
+):
+    """Render (and optionally email) the duty slips of saved allotment `name`.
+
+    Output goes to `out_path`. The frame is loaded from the `data_dir` store
+    here in the worker, not passed in by the page. `email` holds the
+    `send_slip_emails` arguments, with `users` (name of the saved users
+    frame with an "email" column) in place of `jobs`. When emailing, each
+    slip is rendered once into `<out_path>.pages/`: the combined output is
+    concatenated from those pages and the emails attach the same files.
+    `workers` caps the rendering pool (see `JobRunner.cpus_per_job`).
+    """
+    from slips import generate_slips, page_path, slip_digest
+    from storage import get_store
+
+    store = get_store(data_dir)
+    ctx.progress(0, 0, "Loading allotment")
+    rows = _slip_rows(store, name, kind)
+    pages_dir = f"{out_path}.pages" if email else None
+    try:
+        generate_slips(
+            rows,
+            kind,
+            out_path,
+            layout=layout,
+            group_key=group_key,
+            progress=lambda done, total: ctx.progress(
+                done, total, "Rendering duty slips"
+            ),
+            workers=workers,
+            pages_dir=pages_dir,
+        )
+        message = f"Rendered {len(rows)} duty slips."
+        if email:
+            email = dict(email)
+            recipients = _recipients(store, email.pop("users"))
+            jobs = []
+            for i, row in enumerate(rows):
+                uid = str(row["user_id"])
+                if recipients.get(uid):
+                    key = f"{uid}:{slip_digest(kind, row)}"
+                    payload = {"user_id": uid, "path": page_path(pages_dir, i)}
+                    jobs.append((key, recipients[uid], payload))
+
+            counts, failed = send_slip_emails(ctx, jobs=jobs, **email)
+            message += (
+                f" Emails sent: {counts.get('sent', 0)}, "
+                f"failed: {counts.get('failed', 0)}."
+            )
+            prefix = email["prefix"]
+            for key, to_email, error in failed[:20]:
+                uid = key[len(prefix) :].rsplit(":", 1)[0]
+                message += f"\nFailed: {uid} ({to_email}): {error}"
+    finally:
+        if pages_dir:
+            shutil.rmtree(pages_dir, ignore_errors=True)
+    return {
+        "artifact": out_path,
+        "mime": "application/zip" if layout == "zip" else "application/pdf",
+        "message": message,
+    }
+
+
+def send_slip_emails(
+    ctx: JobContext,
+    outbox_path,
+    prefix,
+    jobs,
+    smtp,
+    subject,
+    body,
+    filename_prefix,
+    connections=4,
+    per_second=0,
+    from_addr=None,
+    starttls=True,
+):
+    """Queue `jobs` `(key, email, payload)` under `prefix` and send them.
+
+    Keys are `<user_id>:<slip_digest>`, so a changed slip is mailed again
+    while an unchanged, already sent one is not; unsent keys left over from
+    an earlier run are dropped first. `payload` is `{"user_id", "path"}` of
+    an already rendered slip PDF, which is attached as is. `smtp` is
+    `(host, port, user, password)`, with an empty user for no login;
+    `from_addr` defaults to the user. Returns the outbox counts and failed
+    `(key, to_email, error)` entries for `prefix`.
+    """
+    from mailer import Outbox, SmtpPool, build_message, dispatch
+
+    from_addr = from_addr or smtp[2]
+
+    def _build(to_email, payload):
+        with open(payload["path"], "rb") as f:
+            attachment = f.read()
+        return build_message(
+            from_addr,
+            to_email,
+            subject,
+            body,
+            attachment,
+            f"{filename_prefix}{payload['user_id']}.pdf",
+        )
+
+    with Outbox(outbox_path) as outbox:
+        outbox.drop_unsent(prefix)
+        outbox.add((prefix + key, to_email, payload) for key, to_email, payload in jobs)
+        with SmtpPool(*smtp, size=connections, starttls=starttls) as pool:
+            counts = dispatch(
+                outbox,
+                pool,
+                _build,
+                prefix=prefix,
+                concurrency=connections,
+                per_second=per_second,
+                progress=lambda done, total: ctx.progress(
+                    done, total, "Sending emails"
+                ),
+            )
+        return counts, outbox.failed(prefix)
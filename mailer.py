@@ -0,0 +1,348 @@
+"""Duty slip emails over persistent SMTP connections (no streamlit import).
+
+`SmtpPool` keeps up to `size` authenticated sessions open and sends many
+messages per session instead of a connect + STARTTLS + login per email.
+Dropped sessions are reopened transparently.
+
+Bulk sends go through a persisted `Outbox` (SQLite) and `dispatch`, which
+sends on a thread pool with a rate limit and exponential-backoff retries;
+messages already marked sent are never sent again by a resumed run.
+"""
+import json
+import queue
+import smtplib
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from email import encoders
+from email.mime.base import MIMEBase
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+
+
+# ------------------ MESSAGES ------------------ #
+def build_message(from_addr, to_email, subject, body, attachment_bytes, filename):
+    """Plain-text email with one PDF (octet-stream) attachment."""
+    msg = MIMEMultipart()
+    msg["From"] = from_addr
+    msg["To"] = to_email
+    msg["Subject"] = subject
+
+    msg.attach(MIMEText(body, "plain"))
+
+    part = MIMEBase("application", "octet-stream")
+    part.set_payload(attachment_bytes)
+    encoders.encode_base64(part)
+    part.add_header("Content-Disposition", f"attachment; filename={filename}")
+    msg.attach(part)
+    return msg
+
+
+# ------------------ CONNECTIONS ------------------ #
+# Errors after which the session is unusable and worth reopening once
+_CONNECTION_ERRORS = (smtplib.SMTPServerDisconnected, ConnectionError, TimeoutError)
+
+
+class SmtpConnection:
+    """One authenticated SMTP session, reopened on failure.
+
+    The session is recycled after `max_messages` sends, since many servers
+    cap messages per connection. `starttls=False` / empty `user` allow a
+    plain local server (e.g. aiosmtpd) for testing.
+    """
+
+    def __init__(
+        self,
+        host,
+        port,
+        user,
+        password,
+        starttls=True,
+        timeout=30,
+        max_messages=100,
+    ):
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.starttls = starttls
+        self.timeout = timeout
+        self.max_messages = max_messages
+        self._server = None
+        self._sent = 0
+
+    def _connect(self) -> None:
+        self.close()
+        server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            if self.starttls:
+                server.starttls()
+            if self.user:
+                server.login(self.user, self.password)
+        except BaseException:
+            server.close()
+            raise
+        self._server = server
+        self._sent = 0
+
+    def send(self, msg) -> None:
+        """Send `msg`, (re)connecting as needed; retried once on a dropped session."""
+        if self._server is None or self._sent >= self.max_messages:
+            self._connect()
+        try:
+            self._server.send_message(msg)
+        except _CONNECTION_ERRORS:
+            self._connect()
+            self._server.send_message(msg)
+        except smtplib.SMTPResponseException as e:
+            # 421: server is closing the session
+            if e.smtp_code != 421:
+                raise
+            self._connect()
+            self._server.send_message(msg)
+        self._sent += 1
+
+    def close(self) -> None:
+        if self._server is None:
+            return
+        try:
+            self._server.quit()
+        except (smtplib.SMTPException, OSError):
+            self._server.close()
+        self._server = None
+
+
+class SmtpPool:
+    """Up to `size` `SmtpConnection`s shared between threads.
+
+    Use as a context manager (closes every session on exit); extra keyword
+    arguments go to `SmtpConnection`.
+    """
+
+    def __init__(self, host, port, user, password, size=1, **conn_kwargs):
+        self._factory = lambda: SmtpConnection(
+            host, port, user, password, **conn_kwargs
+        )
+        self.size = size
+        self._idle = queue.LifoQueue()
+        self._all = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection (opens a new one while below `size`)."""
+        try:
+            conn = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                conn = None
+                if len(self._all) < self.size:
+                    conn = self._factory()
+                    self._all.append(conn)
+            if conn is None:
+                conn = self._idle.get()
+        try:
+            yield conn
+        finally:
+            self._idle.put(conn)
+
+    def send(self, msg) -> None:
+        with self.connection() as conn:
+            conn.send(msg)
+
+    def close(self) -> None:
+        with self._lock:
+            for conn in self._all:
+                conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# ------------------ OUTBOX ------------------ #
+class Outbox:
+    """Persisted email queue: one row per message key (e.g. "exam:2:1001").
+
+    Status is "pending", "sent" or "failed". Re-adding a key that was sent
+    is a no-op; a failed one is queued again.
+    """
+
+    def __init__(self, path: str):
+        self._db = sqlite3.connect(path)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            """CREATE TABLE IF NOT EXISTS outbox (
+                key TEXT PRIMARY KEY,
+                to_email TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                last_error TEXT,
+                updated_at REAL
+            )"""
+        )
+        self._db.commit()
+
+    def add(self, items) -> None:
+        """Queue `(key, to_email, payload)` items; `payload` must be JSON-able."""
+        now = time.time()
+        self._db.executemany(
+            """INSERT INTO outbox (key, to_email, payload, updated_at)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT(key) DO UPDATE SET
+                to_email = excluded.to_email,
+                payload = excluded.payload,
+                status = 'pending',
+                attempts = 0,
+                last_error = NULL,
+                updated_at = excluded.updated_at
+            WHERE outbox.status != 'sent'""",
+            (
+                (key, str(to_email), json.dumps(payload, default=str), now)
+                for key, to_email, payload in items
+            ),
+        )
+        self._db.commit()
+
+    def pending(self, prefix: str = ""):
+        """[(key, to_email, payload)] still to send, for keys starting with `prefix`."""
+        rows = self._db.execute(
+            "SELECT key, to_email, payload FROM outbox "
+            "WHERE status = 'pending' AND substr(key, 1, ?) = ? ORDER BY rowid",
+            (len(prefix), prefix),
+        )
+        return [(key, to, json.loads(payload)) for key, to, payload in rows]
+
+    def mark(self, key: str, attempts: int, error: str = None) -> None:
+        """Record the outcome of sending `key` (sent when `error` is None)."""
+        self._db.execute(
+            "UPDATE outbox SET status = ?, attempts = attempts + ?, "
+            "last_error = ?, updated_at = ? WHERE key = ?",
+            ("sent" if error is None else "failed", attempts, error, time.time(), key),
+        )
+        self._db.commit()
+
+    def failed(self, prefix: str = ""):
+        """[(key, to_email, last_error)] of failed keys starting with `prefix`."""
+        return self._db.execute(
+            "SELECT key, to_email, last_error FROM outbox "
+            "WHERE status = 'failed' AND substr(key, 1, ?) = ? ORDER BY rowid",
+            (len(prefix), prefix),
+        ).fetchall()
+
+    def counts(self, prefix: str = "") -> dict:
+        """{status: n} for keys starting with `prefix`."""
+        return dict(
+            self._db.execute(
+                "SELECT status, COUNT(*) FROM outbox "
+                "WHERE substr(key, 1, ?) = ? GROUP BY status",
+                (len(prefix), prefix),
+            ).fetchall()
+        )
+
+    def drop_unsent(self, prefix: str) -> None:
+        """Drop pending/failed keys starting with `prefix` (superseded slips)."""
+        self._db.execute(
+            "DELETE FROM outbox WHERE status != 'sent' AND substr(key, 1, ?) = ?",
+            (len(prefix), prefix),
+        )
+        self._db.commit()
+
+    def forget(self, prefix: str) -> None:
+        """Drop every key starting with `prefix` (e.g. a rolled-back round)."""
+        self._db.execute(
+            "DELETE FROM outbox WHERE substr(key, 1, ?) = ?", (len(prefix), prefix)
+        )
+        self._db.commit()
+
+    def close(self) -> None:
+        self._db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# ------------------ DISPATCH ------------------ #
+class RateLimiter:
+    """At most `per_second` acquisitions per second across threads (0 = off)."""
+
+    def __init__(self, per_second: float):
+        self.interval = 1.0 / per_second if per_second else 0.0
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def wait(self) -> None:
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(self._next, now)
+            self._next = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+def _is_permanent(error: Exception) -> bool:
+    """5xx replies (bad recipient, auth refused, ...) won't succeed on retry."""
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(code >= 500 for code, _ in error.recipients.values())
+    return isinstance(error, smtplib.SMTPResponseException) and error.smtp_code >= 500
+
+
+def dispatch(
+    outbox: Outbox,
+    pool: SmtpPool,
+    build,
+    prefix: str = "",
+    concurrency: int = 4,
+    per_second: float = 0,
+    retries: int = 3,
+    backoff: float = 1.0,
+    progress=None,
+) -> dict:
+    """Send the outbox's pending messages under `prefix`.
+
+    `build(to_email, payload)` returns the message; it runs on the worker
+    threads, so attachments are rendered concurrently. A failed send is
+    retried up to `retries` times after `backoff * 2**attempt` seconds.
+    Each outcome is written to the outbox as it completes;
+    `progress(done, total)` is called likewise. Returns `outbox.counts(prefix)`.
+    """
+    limiter = RateLimiter(per_second)
+
+    def _send(to_email, payload):
+        for attempt in range(retries + 1):
+            limiter.wait()
+            try:
+                pool.send(build(to_email, payload))
+                return attempt + 1, None
+            except Exception as e:
+                if attempt == retries or _is_permanent(e):
+                    return attempt + 1, f"{type(e).__name__}: {e}"
+                time.sleep(backoff * 2**attempt)
+
+    jobs = outbox.pending(prefix)
+    total, done = len(jobs), 0
+    if progress:
+        progress(done, total)
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        futures = {
+            executor.submit(_send, to_email, payload): key
+            for key, to_email, payload in jobs
+        }
+        for future in as_completed(futures):
+            attempts, error = future.result()
+            outbox.mark(futures[future], attempts, error)
+            done += 1
+            if progress:
+                progress(done, total)
+    return outbox.counts(prefix)
@@ -0,0 +1,465 @@
+"""Duty slip PDF rendering (reportlab), shared by the admin bulk export,
+the emailed slips and the user portal.
+
+Each slip layout lives in exactly one place: `draw_exam_slip` /
+`draw_cc_slip` draw a page onto any canvas, and `render_exam_slip` /
+`render_cc_slip` return a standalone one-page PDF. Static text is shared
+across pages through `SlipTemplate` form XObjects. `generate_slips`
+renders large batches in shards on a process pool and writes either one
+merged PDF or a ZIP of per-center PDFs to disk. `SlipCache` keeps rendered
+per-candidate slips for the user portal.
+"""
+import hashlib
+import io
+import os
+import re
+import shutil
+import tempfile
+import threading
+import uuid
+import zipfile
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab.pdfgen import canvas
+
+WIDTH, HEIGHT = A4
+
+
+# ------------------ TEMPLATES ------------------ #
+def _text_width(text: str) -> float:
+    return stringWidth(text, "Helvetica", 12)
+
+
+class SlipTemplate:
+    """Slip page = static layer (title, labels, footer) + variable values.
+
+    The static layer is drawn once per document as a PDF form XObject and
+    stamped onto every page with `doForm`, so each slip only draws its
+    field values. `fields` are `(y, label, value_fn, key)`; a field with a
+    `key` is drawn (label included) only when `key in row`.
+    """
+
+    def __init__(self, name, title, footer, fields):
+        self.name = name
+        self.title = title
+        self.footer = footer
+        self.fields = [
+            (HEIGHT - y, label, value_fn, key, 50 + _text_width(label))
+            for y, label, value_fn, key in fields
+        ]
+
+    def _draw_static(self, c: canvas.Canvas) -> None:
+        c.setFont("Helvetica-Bold", 16)
+        c.drawString(50, HEIGHT - 60, self.title)
+
+        c.setFont("Helvetica", 12)
+        for y, label, _, key, _ in self.fields:
+            if key is None:
+                c.drawString(50, y, label)
+        c.drawString(50, HEIGHT - 220, self.footer)
+
+    def draw(self, c: canvas.Canvas, row) -> None:
+        """Stamp the static layer, draw `row`'s values and end the page."""
+        if not c.hasForm(self.name):
+            c.beginForm(self.name)
+            self._draw_static(c)
+            c.endForm()
+        c.doForm(self.name)
+
+        c.setFont("Helvetica", 12)
+        for y, label, value_fn, key, value_x in self.fields:
+            if key is None:
+                c.drawString(value_x, y, value_fn(row))
+            elif key in row:
+                c.drawString(50, y, label + value_fn(row))
+        c.showPage()
+
+
+def _prefs(row) -> str:
+    return f"{row['pref1']}, {row['pref2']}, {row['pref3']}"
+
+
+EXAM_SLIP = SlipTemplate(
+    "exam_slip_static",
+    "Exam Duty Slip",
+    "Please report to the allotted center as per schedule.",
+    [
+        (100, "Round No: ", lambda row: f"{row['round_no']}", None),
+        (120, "User ID: ", lambda row: f"{row['user_id']}", None),
+        (140, "Allotted Center: ", lambda row: f"{row['allotted_center']}", None),
+        # Venue display
+        (160, "Venue No: ", lambda row: f"{row.get('venueno', '')}", "venueno"),
+        (190, "Preference Order: ", _prefs, None),
+    ],
+)
+
+CC_SLIP = SlipTemplate(
+    "cc_slip_static",
+    "CC / Lab Duty Slip",
+    "Please report to the allotted lab as per schedule.",
+    [
+        (100, "CC Round No: ", lambda row: f"{row['cc_round_no']}", None),
+        (120, "User ID: ", lambda row: f"{row['user_id']}", None),
+        (140, "Exam Center (College): ", lambda row: f"{row['exam_center']}", None),
+        (160, "Lab / Venue No: ", lambda row: f"{row['cc_venueno']}", None),
+        (190, "Preference Order: ", _prefs, None),
+    ],
+)
+
+
+# ------------------ LAYOUT ------------------ #
+def draw_exam_slip(c: canvas.Canvas, row) -> None:
+    """Draw one main exam duty slip page for `row` and end the page."""
+    EXAM_SLIP.draw(c, row)
+
+
+def draw_cc_slip(c: canvas.Canvas, row) -> None:
+    """Draw one CC / lab duty slip page for `row` and end the page."""
+    CC_SLIP.draw(c, row)
+
+
+# ------------------ STANDALONE PDFs ------------------ #
+def _render(draw, row) -> bytes:
+    buffer = io.BytesIO()
+    c = canvas.Canvas(buffer, pagesize=A4)
+    draw(c, row)
+    c.save()
+    return buffer.getvalue()
+
+
+def render_exam_slip(row) -> bytes:
+    """One-page main exam duty slip PDF for `row`."""
+    return _render(draw_exam_slip, row)
+
+
+def render_cc_slip(row) -> bytes:
+    """One-page CC / lab duty slip PDF for `row`."""
+    return _render(draw_cc_slip, row)
+
+
+def new_combined_canvas(target) -> canvas.Canvas:
+    """Canvas for a multi-page slip PDF written to `target` (path or file)."""
+    return canvas.Canvas(target, pagesize=A4)
+
+
+def slip_digest(kind: str, row) -> str:
+    """Short hash of every field of `row`: changes whenever its slip would."""
+    fields = "\x1f".join(f"{key}={row[key]}" for key in sorted(row.keys()))
+    return hashlib.sha256(f"{kind}\x1e{fields}".encode("utf-8")).hexdigest()[:16]
+
+
+# ------------------ PER-CANDIDATE CACHE ------------------ #
+class SlipCache:
+    """Rendered single-candidate slips, in memory (LRU) and on disk.
+
+    Files live in `<cache_dir>/<round_no>/<kind>_<user_id>/<hash>.pdf`,
+    where the hash covers every field of the row, so a changed allotment
+    gets a fresh slip (and the stale one is deleted). `invalidate(round_no)`
+    drops a rolled-back round, `prune(rounds)` every round no longer
+    published. Safe to share between threads/sessions.
+    """
+
+    def __init__(self, cache_dir: str, max_memory: int = 2048):
+        self.cache_dir = cache_dir
+        self.max_memory = max_memory
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _path(self, kind: str, row) -> str:
+        return os.path.join(
+            self.cache_dir,
+            _safe_name(row["round_no"]),
+            f"{kind}_{_safe_name(row['user_id'])}",
+            f"{slip_digest(kind, row)}.pdf",
+        )
+
+    def get(self, kind: str, row) -> bytes:
+        """Slip PDF for `row` ("exam" / "cc"), rendered on first request."""
+        path = self._path(kind, row)
+        with self._lock:
+            if path in self._memory:
+                self._memory.move_to_end(path)
+                return self._memory[path]
+
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            data = render_exam_slip(row) if kind == "exam" else render_cc_slip(row)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.{uuid.uuid4().hex}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+            self._drop_stale(path)
+
+        with self._lock:
+            self._memory[path] = data
+            if len(self._memory) > self.max_memory:
+                self._memory.popitem(last=False)
+        return data
+
+    def _drop_stale(self, path: str) -> None:
+        """Delete the candidate's slips other than `path` (older allotments)."""
+        directory = os.path.dirname(path)
+        with self._lock:
+            for fname in os.listdir(directory):
+                stale = os.path.join(directory, fname)
+                if fname.endswith(".pdf") and stale != path:
+                    self._memory.pop(stale, None)
+                    try:
+                        os.remove(stale)
+                    except FileNotFoundError:
+                        pass
+
+    def prune(self, keep_rounds) -> None:
+        """Drop cached slips of every round not in `keep_rounds`."""
+        keep = {_safe_name(round_no) for round_no in keep_rounds}
+        try:
+            rounds = os.listdir(self.cache_dir)
+        except FileNotFoundError:
+            return
+        for round_dir in rounds:
+            if round_dir not in keep:
+                self.invalidate(round_dir)
+
+    def invalidate(self, round_no=None) -> None:
+        """Drop cached slips of `round_no` (everything when None)."""
+        target = self.cache_dir
+        if round_no is not None:
+            target = os.path.join(self.cache_dir, _safe_name(round_no))
+        with self._lock:
+            prefix = os.path.join(target, "")
+            for path in [p for p in self._memory if p.startswith(prefix)]:
+                del self._memory[path]
+            shutil.rmtree(target, ignore_errors=True)
+
+
+# ------------------ MERGING SHARDS ------------------ #
+_XREF_ENTRY = re.compile(rb"(\d{10}) (\d{5}) ([nf])")
+_REF = re.compile(rb"(\d+) 0 R")
+
+
+def _read_pdf_objects(data: bytes):
+    """Split a reportlab-generated PDF into its objects via the xref table.
+
+    Returns `({num: body}, root, info, pages, kids)` where `kids` lists the
+    page object numbers in order.
+    """
+    xref_pos = int(data[data.rindex(b"startxref") + 9 :].split()[0])
+    header = data[xref_pos:].split(b"\n", 2)
+    first = int(header[1].split()[0])
+    trailer_pos = data.index(b"trailer", xref_pos)
+    entries = _XREF_ENTRY.findall(data, xref_pos, trailer_pos)
+
+    offsets = {
+        first + i: int(off)
+        for i, (off, _, kind) in enumerate(entries)
+        if kind == b"n"
+    }
+    ends = sorted(offsets.values()) + [xref_pos]
+    next_off = {off: ends[i + 1] for i, off in enumerate(ends[:-1])}
+
+    objects = {}
+    for num, off in offsets.items():
+        chunk = data[off : next_off[off]]
+        objects[num] = chunk[chunk.index(b"obj") + 3 : chunk.rindex(b"endobj")]
+
+    trailer = data[trailer_pos:]
+    root = int(re.search(rb"/Root (\d+) 0 R", trailer).group(1))
+    info_match = re.search(rb"/Info (\d+) 0 R", trailer)
+    info = int(info_match.group(1)) if info_match else None
+
+    pages = int(re.search(rb"/Pages (\d+) 0 R", objects[root]).group(1))
+    kids_match = re.search(rb"/Kids \[(.*?)\]", objects[pages], re.S)
+    kids = [int(n) for n in _REF.findall(kids_match.group(1))]
+    return objects, root, info, pages, kids
+
+
+def _renumber(body: bytes, mapping: dict) -> bytes:
+    """Rewrite `N 0 R` references in the dictionary part (not the stream)."""
+    split = body.find(b"stream")
+    head, tail = (body, b"") if split < 0 else (body[:split], body[split:])
+    head = _REF.sub(lambda m: b"%d 0 R" % mapping[int(m.group(1))], head)
+    return head + tail
+
+
+def concat_pdfs(shard_paths, out) -> int:
+    """Concatenate reportlab-generated PDFs into the open binary file `out`.
+
+    Objects are copied verbatim (streams are not decoded) and renumbered,
+    so this is much cheaper than a general-purpose PDF merge. Only one
+    shard is held in memory at a time. Returns the total page count.
+    """
+    out.write(b"%PDF-1.3\n%\x93\x8c\x8b\x9e ReportLab Generated PDF document\n")
+    pages_num, catalog_num, next_num = 1, 2, 3
+    offsets = {}
+    kids = []
+
+    for path in shard_paths:
+        with open(path, "rb") as f:
+            objects, root, info, pages, shard_kids = _read_pdf_objects(f.read())
+
+        mapping = {pages: pages_num}
+        for num in sorted(objects):
+            if num not in (root, info, pages):
+                mapping[num] = next_num
+                next_num += 1
+
+        for num in sorted(objects):
+            if num in (root, info, pages):
+                continue
+            offsets[mapping[num]] = out.tell()
+            out.write(b"%d 0 obj" % mapping[num])
+            out.write(_renumber(objects[num], mapping))
+            out.write(b"endobj\n")
+        kids.extend(mapping[k] for k in shard_kids)
+
+    offsets[pages_num] = out.tell()
+    out.write(b"%d 0 obj\n<<\n/Count %d /Kids [ " % (pages_num, len(kids)))
+    out.write(b" ".join(b"%d 0 R" % k for k in kids))
+    out.write(b" ] /Type /Pages\n>>\nendobj\n")
+
+    offsets[catalog_num] = out.tell()
+    out.write(
+        b"%d 0 obj\n<<\n/PageMode /UseNone /Pages %d 0 R /Type /Catalog\n>>\nendobj\n"
+        % (catalog_num, pages_num)
+    )
+
+    xref_pos = out.tell()
+    out.write(b"xref\n0 %d\n0000000000 65535 f \n" % next_num)
+    for num in range(1, next_num):
+        out.write(b"%010d 00000 n \n" % offsets[num])
+    out.write(
+        b"trailer\n<<\n/Root %d 0 R /Size %d\n>>\nstartxref\n%d\n%%%%EOF\n"
+        % (catalog_num, next_num, xref_pos)
+    )
+    return len(kids)
+
+
+# ------------------ PARALLEL BULK GENERATION ------------------ #
+def _render_shard(task):
+    """Worker: draw `records` of `kind` ("exam" / "cc") into one PDF at `path`."""
+    kind, records, path = task
+    draw = draw_exam_slip if kind == "exam" else draw_cc_slip
+    c = new_combined_canvas(path)
+    for row in records:
+        draw(c, row)
+    c.save()
+    return path, len(records)
+
+
+def _render_pages(task):
+    """Worker: write each of `records` as a standalone one-page PDF."""
+    kind, records, paths = task
+    render = render_exam_slip if kind == "exam" else render_cc_slip
+    for row, path in zip(records, paths):
+        with open(path, "wb") as f:
+            f.write(render(row))
+    return paths, len(records)
+
+
+def page_path(pages_dir: str, i: int) -> str:
+    """Standalone slip PDF of record `i` written by `generate_slips(pages_dir=...)`."""
+    return os.path.join(pages_dir, f"{i:08d}.pdf")
+
+
+def _safe_name(value) -> str:
+    return re.sub(r"[^A-Za-z0-9._-]+", "_", str(value)) or "_"
+
+
+def _run_tasks(worker, tasks, workers):
+    """Yield `worker(task)` results as they finish (in-process if `workers` is 1)."""
+    if workers == 1:
+        yield from map(worker, tasks)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for future in as_completed([pool.submit(worker, t) for t in tasks]):
+            yield future.result()
+
+
+def generate_slips(
+    records,
+    kind: str,
+    out_path: str,
+    layout: str = "merged",
+    group_key: str = None,
+    shard_size: int = 2000,
+    workers: int = None,
+    progress=None,
+    pages_dir: str = None,
+) -> str:
+    """Render slips for `records` (list of row dicts) on a process pool.
+
+    `layout="merged"` writes one PDF to `out_path` (shards of `shard_size`
+    rows, concatenated in order); `layout="zip"` writes a ZIP with one PDF
+    per `group_key` value (e.g. the allotted center). `progress(done, total)`
+    is called as shards finish. `workers` caps the pool (1 renders in this
+    process, e.g. inside a background job). Returns `out_path`.
+
+    With `pages_dir`, each slip is rendered once as a standalone one-page
+    PDF (`page_path(pages_dir, i)`) and the output is concatenated from
+    those pages, so the same bytes can be reused, e.g. as email attachments.
+    """
+    if layout == "zip":
+        groups = {}
+        for i, row in enumerate(records):
+            groups.setdefault(_safe_name(row[group_key]), []).append(i)
+        parts = list(groups.items())
+    else:
+        parts = [
+            (f"part_{i:06d}", range(i, min(i + shard_size, len(records))))
+            for i in range(0, len(records), shard_size)
+        ]
+
+    total = len(records)
+    work_dir = tempfile.mkdtemp(
+        dir=os.path.dirname(out_path) or ".", prefix=".slips_"
+    )
+    try:
+        if pages_dir is None:
+            # Each part drawn straight into one multi-page PDF
+            worker = _render_shard
+            tasks = [
+                (kind, [records[i] for i in idx], os.path.join(work_dir, name + ".pdf"))
+                for name, idx in parts
+            ]
+            part_pages = [[path] for _, _, path in tasks]
+        else:
+            os.makedirs(pages_dir, exist_ok=True)
+            worker = _render_pages
+            tasks = []
+            for i in range(0, total, shard_size):
+                chunk = range(i, min(i + shard_size, total))
+                paths = [page_path(pages_dir, j) for j in chunk]
+                tasks.append((kind, records[i : chunk.stop], paths))
+            part_pages = [[page_path(pages_dir, i) for i in idx] for _, idx in parts]
+
+        done = 0
+        if progress:
+            progress(done, total)
+        for _, count in _run_tasks(worker, tasks, workers):
+            done += count
+            if progress:
+                progress(done, total)
+
+        tmp_out = os.path.join(work_dir, "output")
+        if layout == "zip":
+            with zipfile.ZipFile(tmp_out, "w", zipfile.ZIP_STORED) as zf:
+                for (name, _), pages in zip(parts, part_pages):
+                    part_path = os.path.join(work_dir, name + ".pdf")
+                    if pages_dir is not None:
+                        with open(part_path, "wb") as f:
+                            concat_pdfs(pages, f)
+                    zf.write(part_path, name + ".pdf")
+        else:
+            with open(tmp_out, "wb") as f:
+                concat_pdfs([path for pages in part_pages for path in pages], f)
+        os.replace(tmp_out, out_path)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    return out_path
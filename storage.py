@@ -0,0 +1,789 @@
+"""Persistence helpers for round files in DATA_DIR (no streamlit import).
+
+Writes go to a temp file in the same directory followed by an atomic
+rename, so readers (e.g. the user portal) never see a half-written file.
+Round frames are stored through a pluggable backend: `CsvStore`, the
+columnar `ParquetStore` or `MySqlStore` shared by several app replicas
+(see `get_store`).
+"""
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+from allotment_engine import is_allotted
+
+
+# ------------------ FINGERPRINTS ------------------ #
+def frame_fingerprint(df: pd.DataFrame) -> str:
+    """Content hash of a DataFrame (columns + values, index ignored)."""
+    h = hashlib.sha256()
+    h.update("\x1f".join(map(str, df.columns)).encode("utf-8"))
+    h.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return h.hexdigest()
+
+
+def _fingerprint_path(path: str) -> str:
+    return path + ".sha256"
+
+
+def _file_stamp(path: str) -> str:
+    st = os.stat(path)
+    return f"{st.st_mtime_ns}:{st.st_size}"
+
+
+# ------------------ ATOMIC WRITES ------------------ #
+def atomic_write(path: str, write_fn) -> None:
+    """Call `write_fn(tmp_path)` and atomically move the result to `path`."""
+    # Unique temp name in the same directory (same filesystem for the
+    # rename); created by write_fn so it gets the usual file permissions
+    tmp_path = os.path.join(
+        os.path.dirname(path),
+        f".{os.path.basename(path)}.{os.getpid()}.{uuid.uuid4().hex}.tmp",
+    )
+    try:
+        write_fn(tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def write_csv_atomic(df: pd.DataFrame, path: str) -> None:
+    """Write `df` as CSV via temp file + rename."""
+    atomic_write(path, lambda tmp: df.to_csv(tmp, index=False))
+
+
+def save_frame(df: pd.DataFrame, path: str, writer=None) -> bool:
+    """Persist `df` to `path` only if its content changed.
+
+    `writer(df, tmp_path)` does the actual write (CSV by default).
+
+    The fingerprint is kept in a `<path>.sha256` sidecar together with the
+    file's mtime/size, so a file replaced by someone else is rewritten.
+    Returns True when the file was (re)written.
+    """
+    fingerprint = frame_fingerprint(df)
+    fp_path = _fingerprint_path(path)
+
+    if os.path.exists(path) and os.path.exists(fp_path):
+        with open(fp_path, encoding="utf-8") as f:
+            stored = f.read().split()
+        if stored == [fingerprint, _file_stamp(path)]:
+            return False
+
+    if writer is None:
+        write_csv_atomic(df, path)
+    else:
+        atomic_write(path, lambda tmp: writer(df, tmp))
+
+    def _write_fp(tmp):
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(f"{fingerprint} {_file_stamp(path)}\n")
+
+    atomic_write(fp_path, _write_fp)
+    return True
+
+
+def remove_frame(path: str) -> None:
+    """Delete a saved frame and its fingerprint sidecar (if present)."""
+    for p in (path, _fingerprint_path(path)):
+        if os.path.exists(p):
+            os.remove(p)
+
+
+# ------------------ STORAGE BACKENDS ------------------ #
+# Low-cardinality columns stored dictionary-encoded (categorical)
+DICT_COLUMNS = [
+    "allotted_center",
+    "venueno",
+    "exam_center",
+    "cc_venueno",
+    "source",
+    "status",
+]
+
+
+class CsvStore:
+    """Named frames stored as `<data_dir>/<name>.csv`."""
+
+    suffix = ".csv"
+
+    def __init__(self, data_dir: str):
+        self.data_dir = data_dir
+        os.makedirs(data_dir, exist_ok=True)
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.data_dir, name + self.suffix)
+
+    def exists(self, name: str) -> bool:
+        return os.path.exists(self.path(name))
+
+    def mtime_ns(self, name: str) -> int:
+        """Modification time of `name`'s file (0 if missing)."""
+        try:
+            return os.stat(self.path(name)).st_mtime_ns
+        except FileNotFoundError:
+            return 0
+
+    def save(self, name: str, df: pd.DataFrame) -> bool:
+        """Persist `df` under `name` if changed; True when written."""
+        return save_frame(df, self.path(name))
+
+    def load(self, name: str, columns=None, dtype=None) -> pd.DataFrame:
+        """Load `name`, optionally only the given `columns`.
+
+        `dtype` is passed to `read_csv`; Parquet keeps its stored types.
+        """
+        return pd.read_csv(self.path(name), usecols=columns, dtype=dtype)
+
+    def remove(self, name: str) -> None:
+        remove_frame(self.path(name))
+
+    def list_rounds(self, prefix: str):
+        """[(round_no, name)] for stored frames named `<prefix><n>`."""
+        rounds = {}
+        for fname in os.listdir(self.data_dir):
+            if fname.startswith(prefix) and fname.endswith(self.suffix):
+                try:
+                    rno = int(fname[len(prefix) : -len(self.suffix)])
+                except ValueError:
+                    continue
+                rounds[rno] = prefix + str(rno)
+        return sorted(rounds.items())
+
+
+class ParquetStore(CsvStore):
+    """Named frames stored as `<data_dir>/<name>.parquet` (needs pyarrow).
+
+    Center/venue/source columns are written dictionary-encoded, and
+    `load(columns=...)` only reads the requested columns. Frames that only
+    exist as legacy CSVs are still readable.
+    """
+
+    suffix = ".parquet"
+
+    def _legacy(self) -> CsvStore:
+        return CsvStore(self.data_dir)
+
+    def exists(self, name: str) -> bool:
+        return super().exists(name) or self._legacy().exists(name)
+
+    def mtime_ns(self, name: str) -> int:
+        return super().mtime_ns(name) or self._legacy().mtime_ns(name)
+
+    def save(self, name: str, df: pd.DataFrame) -> bool:
+        return save_frame(df, self.path(name), writer=_write_parquet)
+
+    def load(self, name: str, columns=None, dtype=None) -> pd.DataFrame:
+        if not super().exists(name) and self._legacy().exists(name):
+            return self._legacy().load(name, columns=columns, dtype=dtype)
+        return pd.read_parquet(self.path(name), columns=columns)
+
+    def remove(self, name: str) -> None:
+        super().remove(name)
+        self._legacy().remove(name)
+
+    def list_rounds(self, prefix: str):
+        rounds = dict(self._legacy().list_rounds(prefix))
+        rounds.update(super().list_rounds(prefix))
+        return sorted(rounds.items())
+
+
+def _write_parquet(df: pd.DataFrame, path: str) -> None:
+    out = df.copy(deep=False)
+    for col in out.columns:
+        values = out[col]
+        mixed = values.dtype == object and pd.api.types.infer_dtype(
+            values, skipna=True
+        ).startswith("mixed")
+        if col in DICT_COLUMNS or mixed:
+            # Arrow needs one type per column; keep NaN, stringify the rest
+            values = values.where(values.isna(), values.astype(str))
+            out[col] = values.astype("category") if col in DICT_COLUMNS else values
+    out.to_parquet(path, index=False)
+
+
+# MySQL error code of a missing table (ER_NO_SUCH_TABLE)
+_NO_SUCH_TABLE = 1146
+
+
+class MySqlStore(CsvStore):
+    """Named frames stored as MySQL tables (needs mysql-connector-python).
+
+    Each save bulk-inserts into a new table `frame_<name>__v<version>` (a
+    `_row` column keeping the row order, an index on `user_id`) and then
+    points the `frames` catalog row (columns, types, fingerprint, version)
+    at it in one DML transaction. MySQL DDL commits implicitly, so that
+    catalog row, not the table swap, is the commit point: readers only open
+    the table named by a committed row, and a failed save leaves them on the
+    previous version. Superseded tables are dropped afterwards. Connections
+    come from a pool. `data_dir` still holds the local files (portal
+    indexes, job table, slips).
+    """
+
+    def __init__(
+        self,
+        data_dir: str,
+        host: str = "localhost",
+        port: int = 3306,
+        user: str = None,
+        password: str = None,
+        database: str = None,
+        pool_size: int = 5,
+        batch_size: int = 5000,
+    ):
+        from mysql.connector import pooling
+
+        super().__init__(data_dir)
+        self.batch_size = batch_size
+        self._pool = pooling.MySQLConnectionPool(
+            pool_name=f"allotment_{uuid.uuid4().hex[:8]}",
+            pool_size=pool_size,
+            host=host,
+            port=port,
+            user=user,
+            password=password,
+            database=database,
+            autocommit=False,
+        )
+        self._create_catalog()
+
+    def _create_catalog(self) -> None:
+        with self._cursor() as cur:
+            cur.execute(
+                """CREATE TABLE IF NOT EXISTS frames (
+                    name VARCHAR(128) PRIMARY KEY,
+                    columns_json TEXT NOT NULL,
+                    fingerprint CHAR(64) NOT NULL,
+                    version BIGINT NOT NULL
+                )"""
+            )
+
+    @contextmanager
+    def _cursor(self):
+        conn = self._pool.get_connection()
+        try:
+            cur = conn.cursor()
+            try:
+                yield cur
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+            finally:
+                cur.close()
+        finally:
+            # Returns the connection to the pool
+            conn.close()
+
+    @staticmethod
+    def _table(name: str, version) -> str:
+        return f"frame_{re.sub(r'[^A-Za-z0-9_]', '_', name)}__v{version}"
+
+    def path(self, name: str) -> str:
+        return f"mysql:{name}"
+
+    def _catalog(self, cur, name: str):
+        cur.execute(
+            "SELECT columns_json, fingerprint, version FROM frames WHERE name = %s",
+            (name,),
+        )
+        return cur.fetchone()
+
+    def exists(self, name: str) -> bool:
+        with self._cursor() as cur:
+            return self._catalog(cur, name) is not None
+
+    def mtime_ns(self, name: str) -> int:
+        with self._cursor() as cur:
+            entry = self._catalog(cur, name)
+        return entry[2] if entry else 0
+
+    def save(self, name: str, df: pd.DataFrame) -> bool:
+        fingerprint = frame_fingerprint(df)
+        with self._cursor() as cur:
+            entry = self._catalog(cur, name)
+        if entry is not None and entry[1] == fingerprint:
+            return False
+
+        version = time.time_ns()
+        table = self._table(name, version)
+        columns = [str(col) for col in df.columns]
+        types = [_mysql_type(col, df.iloc[:, i]) for i, col in enumerate(columns)]
+
+        # New table, invisible to readers until the catalog names it
+        definitions = ["`_row` BIGINT NOT NULL PRIMARY KEY"] + [
+            f"{_quote(col)} {sql_type}" for col, sql_type in zip(columns, types)
+        ]
+        if "user_id" in columns:
+            definitions.append("INDEX (`user_id`)")
+        insert = (
+            f"INSERT INTO `{table}` (`_row`, {', '.join(map(_quote, columns))}) "
+            f"VALUES ({', '.join(['%s'] * (len(columns) + 1))})"
+        )
+        rows = _mysql_values(df)
+        try:
+            with self._cursor() as cur:
+                cur.execute(f"CREATE TABLE `{table}` ({', '.join(definitions)})")
+                for start in range(0, len(rows), self.batch_size):
+                    batch = rows[start : start + self.batch_size]
+                    cur.executemany(
+                        insert, [(start + i, *row) for i, row in enumerate(batch)]
+                    )
+        except BaseException:
+            with self._cursor() as cur:
+                cur.execute(f"DROP TABLE IF EXISTS `{table}`")
+            raise
+
+        # Commit point. A newer version saved meanwhile (another replica)
+        # is kept; `version` is assigned last, as MySQL applies the
+        # assignments in order.
+        with self._cursor() as cur:
+            cur.execute(
+                "INSERT INTO frames (name, columns_json, fingerprint, version) "
+                "VALUES (%s, %s, %s, %s) ON DUPLICATE KEY UPDATE "
+                "columns_json = IF(version < VALUES(version), "
+                "VALUES(columns_json), columns_json), "
+                "fingerprint = IF(version < VALUES(version), "
+                "VALUES(fingerprint), fingerprint), "
+                "version = GREATEST(version, VALUES(version))",
+                (name, json.dumps(list(zip(columns, types))), fingerprint, version),
+            )
+            current = self._catalog(cur, name)[2]
+        # Older tables (ours too, if a newer save won) are no longer read
+        self._drop_tables(name, below=current)
+        return True
+
+    def _drop_tables(self, name: str, below: int = None) -> None:
+        """Drop `name`'s tables of versions before `below` (all if None)."""
+        prefix = self._table(name, "")
+        with self._cursor() as cur:
+            cur.execute(
+                "SELECT table_name FROM information_schema.tables "
+                "WHERE table_schema = DATABASE() AND table_name LIKE %s",
+                (prefix + "%",),
+            )
+            tables = [row[0] for row in cur.fetchall()]
+            for table in tables:
+                version = table[len(prefix) :]
+                if not (table.startswith(prefix) and version.isdigit()):
+                    continue
+                if below is None or int(version) < below:
+                    cur.execute(f"DROP TABLE IF EXISTS `{table}`")
+
+    def _read(self, name: str, query, params=()):
+        """Run `query(table, stored)` on the committed table of `name`.
+
+        `stored` is the catalog's `[[column, type], ...]`. Returns `(stored,
+        columns, rows)`, or None when `name` isn't saved. A newer save may
+        drop the table between the catalog read and the query; the catalog
+        is then read again (in a new transaction, to see that save).
+        """
+        for _ in range(3):
+            with self._cursor() as cur:
+                entry = self._catalog(cur, name)
+                if entry is None:
+                    return None
+                stored = json.loads(entry[0])
+                try:
+                    cur.execute(query(self._table(name, entry[2]), stored), params)
+                except Exception as e:
+                    if getattr(e, "errno", None) == _NO_SUCH_TABLE:
+                        continue
+                    raise
+                rows = cur.fetchall()
+                return stored, [d[0] for d in cur.description], rows
+        raise RuntimeError(f"{name}: frame replaced repeatedly while reading")
+
+    def load(self, name: str, columns=None, dtype=None) -> pd.DataFrame:
+        def query(table, stored):
+            wanted = [c for c, _ in stored if columns is None or c in columns]
+            return (
+                f"SELECT {', '.join(map(_quote, wanted))} "
+                f"FROM `{table}` ORDER BY `_row`"
+            )
+
+        result = self._read(name, query)
+        if result is None:
+            raise FileNotFoundError(self.path(name))
+        stored, names, rows = result
+
+        df = pd.DataFrame.from_records(rows, columns=names)
+        # NULL -> NaN, as when reading a CSV
+        df = df.fillna(np.nan)
+        for col, sql_type in stored:
+            if col not in names:
+                continue
+            if sql_type == "BOOLEAN":
+                df[col] = df[col].map({0: False, 1: True})
+            elif sql_type.startswith("DATETIME"):
+                df[col] = pd.to_datetime(df[col])
+        return df.astype(dtype) if dtype else df
+
+    def lookup(self, name: str, user_id: str) -> dict:
+        """First record of `user_id` in `name` as a dict, or None.
+
+        One query on the `user_id` index, so portal replicas don't load (or
+        locally index) the whole frame.
+        """
+        result = self._read(
+            name,
+            lambda table, stored: (
+                f"SELECT * FROM `{table}` WHERE `user_id` = %s "
+                "ORDER BY `_row` LIMIT 1"
+            ),
+            (str(user_id),),
+        )
+        if result is None or not result[2]:
+            return None
+        _, columns, rows = result
+        # NULL -> NaN, as in `load`
+        return {
+            col: np.nan if value is None else value
+            for col, value in zip(columns, rows[0])
+            if col != "_row"
+        }
+
+    def remove(self, name: str) -> None:
+        with self._cursor() as cur:
+            cur.execute("DELETE FROM frames WHERE name = %s", (name,))
+        self._drop_tables(name)
+
+    def list_rounds(self, prefix: str):
+        with self._cursor() as cur:
+            cur.execute("SELECT name FROM frames")
+            names = [row[0] for row in cur.fetchall()]
+        rounds = {}
+        for name in names:
+            if name.startswith(prefix) and name[len(prefix) :].isdigit():
+                rounds[int(name[len(prefix) :])] = name
+        return sorted(rounds.items())
+
+
+def _quote(column: str) -> str:
+    return "`" + column.replace("`", "``") + "`"
+
+
+def _mysql_type(column: str, values: pd.Series) -> str:
+    if pd.api.types.is_bool_dtype(values):
+        return "BOOLEAN"
+    if pd.api.types.is_integer_dtype(values):
+        return "BIGINT"
+    if pd.api.types.is_float_dtype(values):
+        return "DOUBLE"
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return "DATETIME(6)"
+    # user_id is indexed, which needs a bounded length
+    return "VARCHAR(191)" if column == "user_id" else "TEXT"
+
+
+def _mysql_values(df: pd.DataFrame):
+    """Row tuples of plain Python values; NaN -> NULL, text columns as str."""
+    out = df.copy(deep=False)
+    for col in out.columns:
+        values = out[col]
+        if _mysql_type(str(col), values) in ("TEXT", "VARCHAR(191)"):
+            out[col] = values.where(values.isna(), values.astype(str))
+    out = out.astype(object)
+    return out.where(out.notna(), None).to_numpy().tolist()
+
+
+def _mysql_settings() -> dict:
+    """`MySqlStore` connection settings from `ALLOTMENT_MYSQL_*` variables."""
+    env = os.environ.get
+    return dict(
+        host=env("ALLOTMENT_MYSQL_HOST", "localhost"),
+        port=int(env("ALLOTMENT_MYSQL_PORT", "3306")),
+        user=env("ALLOTMENT_MYSQL_USER"),
+        password=env("ALLOTMENT_MYSQL_PASSWORD"),
+        database=env("ALLOTMENT_MYSQL_DATABASE", "allotment"),
+    )
+
+
+def get_store(data_dir: str, backend: str = None) -> CsvStore:
+    """Storage backend for `data_dir`.
+
+    `backend` is "csv", "parquet", "mysql" or None for the
+    `ALLOTMENT_STORAGE` environment variable, defaulting to Parquet when
+    pyarrow is installed. MySQL settings come from `ALLOTMENT_MYSQL_HOST`,
+    `_PORT`, `_USER`, `_PASSWORD` and `_DATABASE`.
+    """
+    backend = backend or os.environ.get("ALLOTMENT_STORAGE")
+    if backend is None:
+        try:
+            import pyarrow  # noqa: F401
+
+            backend = "parquet"
+        except ImportError:
+            backend = "csv"
+
+    if backend == "parquet":
+        return ParquetStore(data_dir)
+    if backend == "csv":
+        return CsvStore(data_dir)
+    if backend == "mysql":
+        return MySqlStore(data_dir, **_mysql_settings())
+    raise ValueError(f"Unknown storage backend: {backend}")
+
+
+# ------------------ PUBLISHED FRAMES + PORTAL INDEX ------------------ #
+# Published frames (e.g. "allotments_latest") get a user_id -> record index
+# in `<name>.index.sqlite`, so the user portal looks up one candidate by
+# primary key instead of parsing the whole frame. Each frame column is a
+# native SQLite column (c0, c1, ...; names in `meta`). A `MySqlStore` is
+# queried directly on its `user_id` index instead.
+INDEX_VERSION = 2
+
+
+def index_path(store: CsvStore, name: str) -> str:
+    return os.path.join(store.data_dir, f"{name}.index.sqlite")
+
+
+def _sql_values(col: pd.Series) -> list:
+    """`col` as SQLite-bindable values: numbers as is, the rest as str,
+    missing as NULL.
+    """
+    values = col if col.dtype.kind in "iufb" else col.astype(str)
+    return values.astype(object).where(col.notna(), None).tolist()
+
+
+def build_index(store: CsvStore, name: str, df: pd.DataFrame) -> None:
+    """(Re)build `name`'s index from `df`; the first row per user_id wins."""
+    columns = [str(col) for col in df.columns]
+    values = [df["user_id"].astype(str).tolist()]
+    values += [_sql_values(df.iloc[:, i]) for i in range(len(columns))]
+    sql_columns = "".join(f", c{i}" for i in range(len(columns)))
+
+    def _write(tmp):
+        db = sqlite3.connect(tmp)
+        try:
+            db.execute(f"PRAGMA user_version = {INDEX_VERSION}")
+            db.execute("CREATE TABLE meta (columns TEXT NOT NULL)")
+            db.execute("INSERT INTO meta VALUES (?)", (json.dumps(columns),))
+            db.execute(
+                f"CREATE TABLE records (user_id TEXT PRIMARY KEY{sql_columns}) "
+                "WITHOUT ROWID"
+            )
+            db.executemany(
+                "INSERT OR IGNORE INTO records VALUES "
+                f"({', '.join('?' * len(values))})",
+                zip(*values),
+            )
+            db.commit()
+        finally:
+            db.close()
+
+    atomic_write(index_path(store, name), _write)
+
+
+def publish(store: CsvStore, name: str, df: pd.DataFrame) -> bool:
+    """Save `df` as `name` and refresh its portal index; True when written."""
+    written = store.save(name, df)
+    if isinstance(store, MySqlStore):
+        return written
+    if written or not os.path.exists(index_path(store, name)):
+        build_index(store, name, df)
+    return written
+
+
+def unpublish(store: CsvStore, name: str) -> None:
+    """Remove a published frame and its index."""
+    store.remove(name)
+    if os.path.exists(index_path(store, name)):
+        os.remove(index_path(store, name))
+
+
+def _fresh_index(store: CsvStore, name: str) -> str:
+    """Path of `name`'s index, (re)built from the stored frame when missing or
+    older than it (e.g. published before indexing existed); None if `name`
+    isn't published.
+    """
+    path = index_path(store, name)
+    frame_mtime = store.mtime_ns(name)
+    if not frame_mtime:
+        return None
+    if not os.path.exists(path) or os.stat(path).st_mtime_ns < frame_mtime:
+        build_index(store, name, store.load(name))
+    return path
+
+
+def _connect_index(path: str):
+    return sqlite3.connect(f"file:{path}?mode=ro", uri=True, check_same_thread=False)
+
+
+def _open_index(store: CsvStore, name: str, path: str):
+    """Read-only connection to `name`'s index at `path` and its column names.
+
+    An index written in an older layout is rebuilt first.
+    """
+    db = _connect_index(path)
+    if db.execute("PRAGMA user_version").fetchone()[0] != INDEX_VERSION:
+        db.close()
+        build_index(store, name, store.load(name))
+        db = _connect_index(path)
+    columns = json.loads(db.execute("SELECT columns FROM meta").fetchone()[0])
+    return db, columns
+
+
+def _fetch(db, columns, user_id) -> dict:
+    """Record of `user_id` as a dict (NULL read back as NaN, like pandas)."""
+    row = db.execute(
+        "SELECT * FROM records WHERE user_id = ?", (str(user_id),)
+    ).fetchone()
+    if row is None:
+        return None
+    return {
+        col: np.nan if value is None else value
+        for col, value in zip(columns, row[1:])
+    }
+
+
+def lookup_record(store: CsvStore, name: str, user_id: str) -> dict:
+    """Published record of `user_id` in `name` as a dict, or None."""
+    if isinstance(store, MySqlStore):
+        return store.lookup(name, user_id)
+    path = _fresh_index(store, name)
+    if path is None:
+        return None
+    db, columns = _open_index(store, name, path)
+    try:
+        return _fetch(db, columns, user_id)
+    finally:
+        db.close()
+
+
+class PublishedCache:
+    """Process-wide read side of the published frames (share one instance).
+
+    Keeps one open index connection per published frame plus an LRU of up
+    to `max_records` decoded records, so concurrent portal sessions share
+    the same memory and repeat lookups don't touch the disk. Entries are
+    keyed on the index file's version (inode, mtime, size): publishing or
+    rolling back a round swaps the file, and the next lookup reopens it.
+    With a `MySqlStore`, lookups go straight to `MySqlStore.lookup`.
+    """
+
+    def __init__(self, store: CsvStore, max_records: int = 100_000):
+        self.store = store
+        self.max_records = max_records
+        self._entries = {}  # name -> (version, db, columns, OrderedDict)
+        self._lock = threading.RLock()
+
+    def _entry(self, name: str):
+        path = _fresh_index(self.store, name)
+        if path is None:
+            self.invalidate(name)
+            return None
+        st = os.stat(path)
+        version = (st.st_ino, st.st_mtime_ns, st.st_size)
+
+        entry = self._entries.get(name)
+        if entry is None or entry[0] != version:
+            self.invalidate(name)
+            db, columns = _open_index(self.store, name, path)
+            entry = (version, db, columns, OrderedDict())
+            self._entries[name] = entry
+        return entry
+
+    def lookup(self, name: str, user_id: str) -> dict:
+        """Published record of `user_id` in `name` as a dict, or None."""
+        key = str(user_id)
+        if isinstance(self.store, MySqlStore):
+            # Indexed query on the shared database (pooled, thread-safe)
+            return self.store.lookup(name, key)
+        with self._lock:
+            entry = self._entry(name)
+            if entry is None:
+                return None
+            _, db, columns, records = entry
+            if key in records:
+                records.move_to_end(key)
+            else:
+                records[key] = _fetch(db, columns, key)
+                if len(records) > self.max_records:
+                    records.popitem(last=False)
+            record = records[key]
+        return dict(record) if record is not None else None
+
+    def invalidate(self, name: str = None) -> None:
+        """Drop the cached entry of `name` (all entries when None)."""
+        with self._lock:
+            for key in [name] if name is not None else list(self._entries):
+                entry = self._entries.pop(key, None)
+                if entry is not None:
+                    entry[1].close()
+
+
+# ------------------ LOCKED-USER INDEX ------------------ #
+# (user_id, round_no) of every user holding a seat in a saved main round
+LOCK_INDEX = "locked_users_index"
+
+
+def _load_lock_index(store: CsvStore) -> pd.DataFrame:
+    if not store.exists(LOCK_INDEX):
+        return rebuild_lock_index(store)
+    df = store.load(LOCK_INDEX, dtype={"user_id": str})
+    df["user_id"] = df["user_id"].astype(str)
+    return df
+
+
+def rebuild_lock_index(store: CsvStore) -> pd.DataFrame:
+    """Rebuild the index from every saved `allotments_round_<n>` frame."""
+    parts = [
+        pd.DataFrame(
+            {"user_id": pd.Series(dtype=str), "round_no": pd.Series(dtype="int32")}
+        )
+    ]
+    for rno, name in store.list_rounds("allotments_round_"):
+        df = store.load(
+            name, columns=["user_id", "allotted_center"], dtype={"user_id": str}
+        )
+        parts.append(_locked_rows(df, rno))
+    index = pd.concat(parts, ignore_index=True)
+    store.save(LOCK_INDEX, index)
+    return index
+
+
+def _locked_rows(allot_df: pd.DataFrame, round_no: int) -> pd.DataFrame:
+    allotted = allot_df[is_allotted(allot_df)]
+    return pd.DataFrame(
+        {
+            "user_id": allotted["user_id"].astype(str).to_numpy(),
+            "round_no": np.int32(round_no),
+        }
+    )
+
+
+def save_locked_round(
+    store: CsvStore, round_no: int, allot_df: pd.DataFrame
+) -> None:
+    """Replace `round_no`'s entries in the index with `allot_df`'s allotted users."""
+    index = _load_lock_index(store)
+    index = pd.concat(
+        [index[index["round_no"] != round_no], _locked_rows(allot_df, round_no)],
+        ignore_index=True,
+    )
+    store.save(LOCK_INDEX, index)
+
+
+def drop_locked_round(store: CsvStore, round_no: int) -> None:
+    """Remove `round_no`'s entries from the index (round rolled back)."""
+    index = _load_lock_index(store)
+    store.save(LOCK_INDEX, index[index["round_no"] != round_no])
+
+
+def load_locked_users(store: CsvStore, before_round: int) -> set:
+    """user_ids allotted in any saved main round below `before_round`."""
+    index = _load_lock_index(store)
+    return set(index.loc[index["round_no"] < before_round, "user_id"])
@@ -0,0 +1,249 @@
+"""Parity of the array ranking/allotment kernels with the original row loops."""
+import random
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from allotment_engine import AllotmentEngine, numba
+
+SEEDS = [0, 1, 2, 3, 4]
+
+
+def random_inputs(seed, n_users=1500, n_centers=25):
+    rng = np.random.default_rng(seed)
+    codes = [str(100 + i) for i in range(n_centers)]
+
+    # Several venue rows per center; duplicates, zero and negative capacities
+    n_rows = n_centers * 3
+    center_df = pd.DataFrame(
+        {
+            "center_code": rng.choice(codes, n_rows),
+            "venueno": rng.choice([f"V{i}" for i in range(40)], n_rows),
+            "capacity": rng.integers(-2, 40, n_rows),
+        }
+    )
+
+    # Preferences include unknown centers and missing values
+    choices = np.array(codes + ["999", None], dtype=object)
+    users_df = pd.DataFrame(
+        {
+            "user_id": [f"U{i}" for i in range(n_users)],
+            "pref1": rng.choice(choices, n_users),
+            "pref2": rng.choice(choices, n_users),
+            "pref3": rng.choice(choices, n_users),
+            "created_at": pd.Timestamp("2025-01-01")
+            + pd.to_timedelta(rng.integers(0, 10**6, n_users), "s"),
+        }
+    )
+    excluded = [f"U{i}" for i in rng.choice(n_users, n_users // 10, replace=False)]
+    fixed = {
+        "U1": codes[0],  # usually succeeds
+        "U2": "999",  # unknown center -> MANUAL-FAILED
+        "NOPE": codes[1],  # unknown user -> skipped
+    }
+    lab_df = pd.DataFrame(
+        {
+            "collegecode": rng.choice(codes, n_centers * 2),
+            "venueno": rng.choice([f"L{i}" for i in range(30)], n_centers * 2),
+            "tempvno": rng.integers(0, 30, n_centers * 2),
+        }
+    )
+    return center_df, users_df, excluded, fixed, lab_df
+
+
+# ------------------ ORIGINAL ROW LOOPS ------------------ #
+def reference_rank(df, seed=2025):
+    """The original `random.random()` ranking."""
+    random.seed(seed)
+
+    # Random score for tie-breaking
+    df["random_score"] = [random.random() for _ in range(len(df))]
+
+    # Sort by created_at to get FCFS priority
+    df = df.sort_values(by="created_at", ascending=True)
+    df["fcfs_rank"] = range(1, len(df) + 1)
+    df["fcfs_weight"] = 1 / df["fcfs_rank"]  # earlier = bigger weight
+
+    # Combined score: adjust weights if you want
+    df["final_score"] = 0.7 * df["fcfs_weight"] + 0.3 * df["random_score"]
+
+    # Final ranking (higher score = higher priority)
+    df = df.sort_values(by="final_score", ascending=False).reset_index(drop=True)
+    df["rank"] = range(1, len(df) + 1)
+
+    return df
+
+
+def reference_allot_main(center_df, ranked_users, excluded_users, fixed_assignments):
+    """The original dict/list allotment loop, returning (center, venue) pairs."""
+    center_df = center_df.astype({"center_code": str, "venueno": str, "capacity": int})
+    remaining = center_df.groupby("center_code")["capacity"].sum().to_dict()
+    venue_map = {}
+    for _, r in center_df.iterrows():
+        venues = venue_map.setdefault(r["center_code"], [])
+        venues.extend([r["venueno"]] * r["capacity"])
+
+    out = []
+    for user_str, center_code in fixed_assignments.items():
+        if not (ranked_users["user_id"].astype(str) == user_str).any():
+            continue
+        if center_code in remaining and remaining[center_code] > 0:
+            remaining[center_code] -= 1
+            venues = venue_map.get(center_code)
+            out.append((center_code, venues.pop(0) if venues else "NO_VENUE"))
+        else:
+            out.append(("NOT ALLOTTED (NO CAPACITY)", ""))
+
+    excluded = set(excluded_users)
+    for _, row in ranked_users.iterrows():
+        u_str = str(row["user_id"])
+        if u_str in fixed_assignments:
+            continue
+        if u_str in excluded:
+            out.append(("EXCLUDED_THIS_ROUND", ""))
+            continue
+        result = ("NOT ALLOTTED (NO SEAT)", "")
+        for p in [row["pref1"], row["pref2"], row["pref3"]]:
+            if pd.isna(p):
+                continue
+            p_str = str(p)
+            if p_str in remaining and remaining[p_str] > 0:
+                remaining[p_str] -= 1
+                venues = venue_map.get(p_str)
+                result = (p_str, venues.pop(0) if venues else "NO_VENUE")
+                break
+        out.append(result)
+    return out
+
+
+def reference_allot_cc(final_allot_df, lab_df):
+    """The original CC loop, returning (user_id, cc_venueno) pairs."""
+    lab_df = lab_df.astype({"collegecode": str, "venueno": str, "tempvno": int})
+    cc_remaining = {
+        key: cap
+        for key, cap in lab_df.groupby(["collegecode", "venueno"])["tempvno"]
+        .sum()
+        .items()
+    }
+    centers = final_allot_df["allotted_center"].astype(str)
+    valid_exam = final_allot_df[
+        ~centers.str.startswith("NOT")
+        & ~centers.isin(["EXCLUDED_THIS_ROUND", "MANUAL-FAILED"])
+    ].sort_values(by="rank")
+
+    out = []
+    for _, row in valid_exam.iterrows():
+        college = str(row["allotted_center"])
+        possible = [k for k, cap in cc_remaining.items() if k[0] == college and cap > 0]
+        if possible:
+            chosen = sorted(possible, key=lambda k: k[1])[0]
+            cc_remaining[chosen] -= 1
+            out.append((row["user_id"], chosen[1]))
+        else:
+            out.append((row["user_id"], "NO_LAB_SEAT"))
+    return out
+
+
+# ------------------ TESTS ------------------ #
+KERNELS = [
+    False,
+    pytest.param(
+        True, marks=pytest.mark.skipif(numba is None, reason="numba not installed")
+    ),
+]
+
+
+@pytest.mark.parametrize("compiled", KERNELS)
+@pytest.mark.parametrize("seed", SEEDS)
+def test_allot_main_matches_row_loop(seed, compiled):
+    center_df, users_df, excluded, fixed, _ = random_inputs(seed)
+    engine = AllotmentEngine(center_df, seed=seed, compiled=compiled)
+    ranked = engine.rank(users_df)
+
+    result = engine.allot_main(ranked, excluded_users=excluded, fixed_assignments=fixed)
+    expected = reference_allot_main(center_df, ranked, excluded, fixed)
+
+    got = list(
+        zip(result["allotted_center"].astype(str), result["venueno"].astype(str))
+    )
+    assert got == expected
+
+
+@pytest.mark.skipif(numba is None, reason="numba not installed")
+@pytest.mark.parametrize("seed", SEEDS)
+def test_compiled_matches_python_kernel(seed):
+    center_df, users_df, excluded, fixed, _ = random_inputs(seed)
+    results = []
+    for compiled in (True, False):
+        engine = AllotmentEngine(center_df, seed=seed, compiled=compiled)
+        results.append(
+            engine.allot_main(
+                engine.rank(users_df), excluded_users=excluded, fixed_assignments=fixed
+            )
+        )
+    pd.testing.assert_frame_equal(results[0], results[1])
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_allot_cc_matches_row_loop(seed):
+    center_df, users_df, excluded, fixed, lab_df = random_inputs(seed)
+    engine = AllotmentEngine(center_df, seed=seed)
+    final_allot_df = engine.allot_main(
+        engine.rank(users_df), excluded_users=excluded, fixed_assignments=fixed
+    )
+
+    cc_allot_df = engine.allot_cc(final_allot_df, lab_df)
+    expected = reference_allot_cc(final_allot_df, lab_df)
+
+    got = list(zip(cc_allot_df["user_id"], cc_allot_df["cc_venueno"].astype(str)))
+    assert got == expected
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_legacy_rank_matches_original(seed):
+    center_df, users_df, *_ = random_inputs(seed)
+    ranked = AllotmentEngine(center_df, seed=seed, legacy_rank=True).rank(users_df)
+    pd.testing.assert_frame_equal(ranked, reference_rank(users_df.copy(), seed=seed))
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_rank_orders_by_score_then_fcfs(seed):
+    center_df, users_df, *_ = random_inputs(seed)
+    # Same timestamps for some users: FCFS keeps their file order
+    users_df.loc[::7, "created_at"] = users_df["created_at"].iloc[0]
+    ranked = AllotmentEngine(center_df, seed=seed).rank(users_df)
+
+    n = len(users_df)
+    created_at = users_df["created_at"].tolist()
+    fcfs_rank = np.empty(n, dtype=np.int32)
+    fcfs_rank[sorted(range(n), key=lambda i: (created_at[i], i))] = np.arange(1, n + 1)
+    score = 0.7 * (1.0 / fcfs_rank) + 0.3 * np.random.default_rng(seed).random(n)
+    expected = sorted(range(n), key=lambda i: (-score[i], fcfs_rank[i]))
+
+    assert ranked["user_id"].tolist() == users_df["user_id"].take(expected).tolist()
+    assert ranked["fcfs_rank"].tolist() == fcfs_rank[expected].tolist()
+    assert ranked["rank"].tolist() == list(range(1, n + 1))
+
+
+def test_rank_score_ties_go_to_earlier_fcfs(monkeypatch):
+    class FixedScores:
+        def random(self, n):
+            return np.array(scores)
+
+    # 2nd and 4th by FCFS end up with the same score, 0.7 / 2 == 0.7 / 4 + 0.175
+    users_df = pd.DataFrame(
+        {
+            "user_id": ["fourth", "third", "second", "first"],
+            "created_at": pd.to_datetime(
+                ["2025-01-04", "2025-01-03", "2025-01-02", "2025-01-01"]
+            ),
+        }
+    )
+    scores = [0.175 / 0.3, 0.0, 0.0, 0.0]
+    engine = AllotmentEngine(random_inputs(0)[0])
+    monkeypatch.setattr(np.random, "default_rng", lambda seed: FixedScores())
+    ranked = engine.rank(users_df)
+
+    assert ranked["final_score"][1] == ranked["final_score"][2]
+    assert ranked["user_id"].tolist() == ["first", "second", "fourth", "third"]
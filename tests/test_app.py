@@ -0,0 +1,89 @@
+"""Admin page runs through Streamlit's AppTest, with uploads read from disk."""
+import os
+import textwrap
+
+import pytest
+
+streamlit = pytest.importorskip("streamlit")
+from streamlit.testing.v1 import AppTest  # noqa: E402
+
+from storage import get_store  # noqa: E402
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The app with st.file_uploader returning the files named in UPLOAD_<KEY>
+WRAPPER = """
+import io, os, runpy, sys
+import streamlit as st
+
+sys.path.insert(0, {root!r})
+
+
+class Upload(io.BytesIO):
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            super().__init__(f.read())
+        self.name = os.path.basename(path)
+
+
+def file_uploader(label, type=None, key=None, **kwargs):
+    path = os.environ.get(f"UPLOAD_{{key}}".upper())
+    return Upload(path) if path else None
+
+
+st.file_uploader = file_uploader
+runpy.run_path({app!r}, run_name="__main__")
+"""
+
+CENTERS = "center_code,venueno,capacity\n101,V1,2\n102,V2,2\n"
+USERS = "user_id,pref1,pref2,pref3,created_at\n" + "".join(
+    f"{i},101,102,101,2025-01-0{i} 10:00:00\n" for i in range(1, 6)
+)
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    wrapper = tmp_path / "wrapper.py"
+    wrapper.write_text(
+        textwrap.dedent(
+            WRAPPER.format(
+                root=ROOT, app=os.path.join(ROOT, "exam_duty_allotment_app.py")
+            )
+        )
+    )
+    (tmp_path / "centers.csv").write_text(CENTERS)
+    monkeypatch.setenv("UPLOAD_CENTER_FILE", str(tmp_path / "centers.csv"))
+    streamlit.cache_data.clear()
+    streamlit.cache_resource.clear()
+    yield AppTest.from_file(str(wrapper), default_timeout=120)
+    streamlit.cache_resource.clear()
+
+
+def upload_users(tmp_path, monkeypatch, text, name):
+    path = tmp_path / name
+    path.write_text(text)
+    monkeypatch.setenv("UPLOAD_USER_FILE", str(path))
+
+
+def test_reupload_with_emails_updates_saved_users(app, tmp_path, monkeypatch):
+    upload_users(tmp_path, monkeypatch, USERS, "users.csv")
+    app.run()
+    assert not app.exception
+    store = get_store("data")
+    assert "email" not in store.load("users_round_1").columns
+    allotment = store.load("allotments_round_1")
+
+    # Same users and preferences, so the same allotment; only emails added
+    with_emails = USERS.replace("created_at\n", "created_at,email\n")
+    with_emails = "\n".join(
+        line + (f",u{i}@x.org" if i else "")
+        for i, line in enumerate(with_emails.strip().split("\n"))
+    )
+    upload_users(tmp_path, monkeypatch, with_emails + "\n", "users_emails.csv")
+    app.run()
+    assert not app.exception
+
+    assert store.load("allotments_round_1").equals(allotment)
+    users = store.load("users_round_1")
+    assert users["email"].tolist() == [f"u{i}@x.org" for i in range(1, 6)]
@@ -0,0 +1,97 @@
+"""Typed loading of uploaded users files, in particular `created_at`."""
+import datetime
+
+import pandas as pd
+import pytest
+
+from ingest import CENTERS, LABS, USERS, load_table, parse_datetimes
+
+HEADER = "user_id,pref1,pref2,pref3,created_at,email\n"
+
+
+def users_csv(*created_at):
+    rows = [
+        f"{i},101,102.0, 103 ,{value},u{i}@x.org\n"
+        for i, value in enumerate(created_at, 1)
+    ]
+    return (HEADER + "".join(rows)).encode()
+
+
+@pytest.mark.parametrize(
+    "values, expected",
+    [
+        # Date only (pyarrow alone would read these as `date` objects)
+        (["2025-01-08", "2025-02-01", ""], ["2025-01-08", "2025-02-01", None]),
+        # ISO date and time
+        (
+            ["2025-01-08 20:33:43", "2025-01-09T07:05:00", ""],
+            ["2025-01-08 20:33:43", "2025-01-09 07:05:00", None],
+        ),
+        # Day first, first value ambiguous
+        (["08/01/2025", "25/01/2025", ""], ["2025-01-08", "2025-01-25", None]),
+        (
+            ["08/01/2025 10:30", "25/01/2025 09:00", ""],
+            ["2025-01-08 10:30", "2025-01-25 09:00", None],
+        ),
+        # Month first
+        (["01/08/2025", "01/25/2025", ""], ["2025-01-08", "2025-01-25", None]),
+    ],
+)
+def test_created_at_formats(values, expected):
+    df, stats = load_table(users_csv(*values), "users.csv", USERS)
+
+    assert stats.rows == 3
+    assert pd.api.types.is_datetime64_any_dtype(df["created_at"])
+    pd.testing.assert_series_equal(
+        df["created_at"],
+        pd.Series(pd.to_datetime(expected), name="created_at"),
+        check_dtype=False,
+    )
+    assert df["pref2"].tolist() == ["102"] * 3
+    assert df["pref3"].tolist() == ["103"] * 3
+
+
+def test_header_only_file():
+    df, stats = load_table(HEADER.encode(), "users.csv", USERS)
+
+    assert stats.rows == 0
+    assert list(df.columns) == HEADER.strip().split(",")
+    assert pd.api.types.is_datetime64_any_dtype(df["created_at"])
+
+
+def test_empty_file():
+    df, stats = load_table(b"", "users.csv", USERS)
+    assert stats.rows == 0 and df.columns.empty
+
+
+def test_parse_date_objects():
+    # e.g. a column of dates read from Excel
+    values = pd.Series(
+        [datetime.date(2025, 1, 8), None, datetime.datetime(2025, 1, 9, 7, 5)],
+        dtype=object,
+    )
+    parsed = parse_datetimes(values)
+    assert parsed.tolist()[0] == pd.Timestamp("2025-01-08")
+    assert pd.isna(parsed[1])
+    assert parsed[2] == pd.Timestamp("2025-01-09 07:05")
+
+
+def test_leading_zeros_match_across_files():
+    users, _ = load_table(
+        HEADER.encode() + b"1,0101,102,00103.0,2025-01-08,u1@x.org\n",
+        "users.csv",
+        USERS,
+    )
+    centers, _ = load_table(
+        b"center_code,venueno,capacity\n101,V1,2\n0102,V2,2\n103,V3,2\nA01,V4,1\n",
+        "centers.csv",
+        CENTERS,
+    )
+    labs, _ = load_table(
+        b"collegecode,venueno,capacity\n000101,L1,5\n", "labs.csv", LABS
+    )
+
+    prefs = users.loc[0, ["pref1", "pref2", "pref3"]].tolist()
+    assert prefs == ["101", "102", "103"]
+    assert centers["center_code"].tolist() == ["101", "102", "103", "A01"]
+    assert labs["collegecode"].tolist() == ["101"]
@@ -0,0 +1,97 @@
+"""Job table ownership, and slip emails sent from a job."""
+import os
+import socket
+import subprocess
+import sys
+
+import pytest
+
+import jobs
+from jobs import OWNER, JobContext, JobRunner, JobStore, send_slip_emails
+
+
+def test_runner_fails_only_orphaned_jobs(tmp_path):
+    db_path = str(tmp_path / "jobs.sqlite")
+    exited = subprocess.Popen([sys.executable, "-c", "pass"])
+    exited.wait()
+    live = subprocess.Popen([sys.executable, "-c", "import time; time.sleep(60)"])
+    owners = {
+        "this runner": OWNER,
+        "earlier process, same pid": f"{os.getpid()}:000000000000",
+        "exited process": f"{exited.pid}:000000000000",
+        "live process": f"{live.pid}:000000000000",
+        "no owner": None,
+    }
+    try:
+        store = JobStore(db_path)
+        ids = {
+            label: store.create("exam", label, owner)
+            for label, owner in owners.items()
+        }
+        store.update(ids["live process"], status="running")
+        store.close()
+
+        runner = JobRunner(db_path, workers=1)
+        runner.shutdown()
+    finally:
+        live.kill()
+        live.wait()
+
+    store = JobStore(db_path)
+    status = {label: store.get(job_id)["status"] for label, job_id in ids.items()}
+    store.close()
+    assert status == {
+        "this runner": "queued",
+        "earlier process, same pid": "failed",
+        "exited process": "failed",
+        "live process": "running",
+        "no owner": "failed",
+    }
+
+
+def test_cpus_per_job(tmp_path, monkeypatch):
+    monkeypatch.setattr(jobs.os, "cpu_count", lambda: 8)
+    runner = JobRunner(str(tmp_path / "jobs.sqlite"), workers=2)
+    runner.shutdown()
+    assert runner.cpus_per_job == 4
+
+
+def test_send_slip_emails_without_tls_or_login(tmp_path):
+    pytest.importorskip("aiosmtpd")
+    from aiosmtpd.controller import Controller
+
+    class Handler:
+        def __init__(self):
+            self.messages = []
+
+        async def handle_DATA(self, server, session, envelope):
+            self.messages.append((envelope.mail_from, envelope.rcpt_tos))
+            return "250 OK"
+
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    handler = Handler()
+    controller = Controller(handler, hostname="127.0.0.1", port=port)
+    controller.start()
+    try:
+        slip = tmp_path / "slip.pdf"
+        slip.write_bytes(b"%PDF")
+        ctx = JobContext(JobStore(str(tmp_path / "jobs.sqlite")), "job")
+        counts, failed = send_slip_emails(
+            ctx,
+            outbox_path=str(tmp_path / "outbox.sqlite"),
+            prefix="exam:1:",
+            jobs=[("10:abc", "u10@x.org", {"user_id": "10", "path": str(slip)})],
+            # No STARTTLS offered and no login: a local relay
+            smtp=("127.0.0.1", port, "", ""),
+            subject="Exam Duty Slip",
+            body="Attached.",
+            filename_prefix="duty_slip_",
+            from_addr="exams@x.org",
+            starttls=False,
+        )
+    finally:
+        controller.stop()
+    assert counts == {"sent": 1} and not failed
+    assert handler.messages == [("exams@x.org", ["u10@x.org"])]
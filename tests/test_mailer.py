@@ -0,0 +1,190 @@
+"""Outbox dispatch against an in-process SMTP server (aiosmtpd).
+
+The handler below accepts everything except recipients scripted to be
+refused (5xx), deferred (4xx), answered with 421 or dropped mid-session,
+and records each delivered message and each session opened.
+"""
+import socket
+import time
+
+import pytest
+
+pytest.importorskip("aiosmtpd")
+from aiosmtpd.controller import Controller  # noqa: E402
+
+from mailer import (  # noqa: E402
+    Outbox,
+    RateLimiter,
+    SmtpPool,
+    build_message,
+    dispatch,
+)
+
+
+class Handler:
+    def __init__(self):
+        self.delivered = []
+        self.sessions = 0
+        # {recipient: [reply, ...]}: replies to its next sends, in order
+        self.script = {}
+
+    async def handle_EHLO(self, server, session, envelope, hostname, responses):
+        session.host_name = hostname
+        self.sessions += 1
+        return responses
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        if address.startswith("bad"):
+            return "550 No such user"
+        envelope.rcpt_tos.append(address)
+        return "250 OK"
+
+    async def handle_DATA(self, server, session, envelope):
+        to_email = envelope.rcpt_tos[0]
+        replies = self.script.get(to_email)
+        reply = replies.pop(0) if replies else "250 OK"
+        if reply == "drop":
+            server.transport.close()
+            return "250 OK"
+        if reply.startswith("250"):
+            self.delivered.append(to_email)
+        return reply
+
+
+@pytest.fixture
+def smtp():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        port = s.getsockname()[1]
+    handler = Handler()
+    controller = Controller(handler, hostname="127.0.0.1", port=port)
+    controller.start()
+    yield handler, port
+    controller.stop()
+
+
+def pool_for(port, **kwargs):
+    return SmtpPool("127.0.0.1", port, "", "", starttls=False, **kwargs)
+
+
+def build(to_email, payload):
+    return build_message(
+        "admin@x.org", to_email, "Duty slip", "Attached.", b"%PDF", payload["file"]
+    )
+
+
+def enqueue(outbox, recipients, prefix="exam:1:"):
+    outbox.add(
+        (f"{prefix}{i}", to_email, {"file": f"{i}.pdf"})
+        for i, to_email in enumerate(recipients)
+    )
+
+
+def test_resumed_run_sends_only_unsent(smtp, tmp_path):
+    handler, port = smtp
+    recipients = [f"u{i}@x.org" for i in range(5)]
+    # Interrupted run: only the first two went out
+    with Outbox(str(tmp_path / "outbox.sqlite")) as outbox:
+        enqueue(outbox, recipients[:2])
+        with pool_for(port) as pool:
+            dispatch(outbox, pool, build, prefix="exam:1:")
+        enqueue(outbox, recipients)
+
+    # Resumed in a new process: same items queued again, plus one new
+    with Outbox(str(tmp_path / "outbox.sqlite")) as outbox:
+        enqueue(outbox, recipients + ["u5@x.org"])
+        with pool_for(port) as pool:
+            counts = dispatch(outbox, pool, build, prefix="exam:1:", concurrency=2)
+    assert counts == {"sent": 6}
+    assert sorted(handler.delivered) == sorted(recipients + ["u5@x.org"])
+
+    # A third run has nothing left to send
+    with Outbox(str(tmp_path / "outbox.sqlite")) as outbox:
+        enqueue(outbox, recipients)
+        with pool_for(port) as pool:
+            assert dispatch(outbox, pool, build, prefix="exam:1:") == {"sent": 6}
+    assert len(handler.delivered) == 6
+
+
+def test_permanent_and_retryable_errors(smtp, tmp_path):
+    handler, port = smtp
+    handler.script = {
+        "deferred@x.org": ["451 Try again later", "451 Try again later"],
+        "full@x.org": ["552 Mailbox full"],
+        "dropped@x.org": ["drop"],
+        "down@x.org": ["451 Try again later"] * 5,
+    }
+    recipients = [
+        "ok@x.org",
+        "bad@x.org",
+        "deferred@x.org",
+        "full@x.org",
+        "dropped@x.org",
+        "down@x.org",
+    ]
+    with Outbox(str(tmp_path / "outbox.sqlite")) as outbox:
+        enqueue(outbox, recipients)
+        with pool_for(port) as pool:
+            counts = dispatch(outbox, pool, build, concurrency=1, backoff=0)
+        attempts = dict(
+            outbox._db.execute("SELECT to_email, attempts FROM outbox").fetchall()
+        )
+        failed = {to_email: error for _, to_email, error in outbox.failed()}
+
+    assert counts == {"sent": 3, "failed": 3}
+    assert sorted(handler.delivered) == [
+        "deferred@x.org",
+        "dropped@x.org",
+        "ok@x.org",
+    ]
+    # 5xx: no retry; 4xx: retried (3 retries by default)
+    assert attempts["bad@x.org"] == 1 and "550" in failed["bad@x.org"]
+    assert attempts["full@x.org"] == 1 and "552" in failed["full@x.org"]
+    assert attempts["deferred@x.org"] == 3
+    assert attempts["down@x.org"] == 4 and "451" in failed["down@x.org"]
+    # A dropped session is reopened and the message resent within one attempt
+    assert attempts["dropped@x.org"] == 1
+
+
+def test_reconnects_after_421_and_max_messages(smtp):
+    handler, port = smtp
+    with pool_for(port, max_messages=2) as pool:
+        for i in range(5):
+            pool.send(build(f"u{i}@x.org", {"file": "slip.pdf"}))
+    assert len(handler.delivered) == 5
+    # Sessions of 2 + 2 + 1 messages
+    assert handler.sessions == 3
+
+    handler.sessions = 0
+    handler.script = {"u1@x.org": ["421 Closing connection"]}
+    with pool_for(port) as pool:
+        for i in range(3):
+            pool.send(build(f"u{i}@x.org", {"file": "slip.pdf"}))
+    assert handler.delivered[5:] == ["u0@x.org", "u1@x.org", "u2@x.org"]
+    assert handler.sessions == 2
+
+
+def test_rate_limit(smtp, tmp_path):
+    handler, port = smtp
+    with Outbox(str(tmp_path / "outbox.sqlite")) as outbox:
+        enqueue(outbox, [f"u{i}@x.org" for i in range(6)])
+        start = time.monotonic()
+        with pool_for(port, size=3) as pool:
+            dispatch(outbox, pool, build, concurrency=3, per_second=20)
+        elapsed = time.monotonic() - start
+    assert len(handler.delivered) == 6
+    # 6 sends at 20/s: the last may start 5 intervals after the first
+    assert elapsed >= 5 / 20
+
+
+def test_rate_limiter_spaces_calls():
+    limiter = RateLimiter(50)
+    start = time.monotonic()
+    for _ in range(6):
+        limiter.wait()
+    assert time.monotonic() - start >= 5 / 50
+    # 0 turns it off
+    start = time.monotonic()
+    for _ in range(100):
+        RateLimiter(0).wait()
+    assert time.monotonic() - start < 0.05
@@ -0,0 +1,364 @@
+"""MySqlStore: versioned frame tables committed through the `frames` catalog.
+
+The stand-in pool below runs the store's SQL on SQLite, translating the few
+MySQL-only bits, so saves, loads (types and NULLs) and the portal lookup
+are checked without a server. Set `ALLOTMENT_MYSQL_HOST` (and `_PORT`,
+`_USER`, `_PASSWORD`, `_DATABASE`), e.g. for `docker run -e
+MYSQL_ROOT_PASSWORD=... -p 3306:3306 mysql:8`, to also run against a real
+server.
+"""
+import datetime
+import json
+import math
+import os
+import re
+import sqlite3
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import storage
+from storage import (
+    CsvStore,
+    MySqlStore,
+    PublishedCache,
+    _mysql_settings,
+    index_path,
+    lookup_record,
+    publish,
+)
+
+
+# ------------------ STAND-IN POOL ------------------ #
+class FakeError(Exception):
+    def __init__(self, errno, msg):
+        super().__init__(msg)
+        self.errno = errno
+
+
+def to_sqlite(sql):
+    """The store's MySQL statements in SQLite's dialect (plus extra DDL)."""
+    sql = " ".join(sql.split()).replace("%s", "?")
+    extra = []
+    index = re.match(r"CREATE TABLE (`[^`]+`) \((.*), INDEX \((`\w+`)\)\)$", sql)
+    if index:
+        table, definitions, column = index.groups()
+        sql = f"CREATE TABLE {table} ({definitions})"
+        extra.append(f"CREATE INDEX `{table[1:-1]}_idx` ON {table} ({column})")
+    sql = sql.replace(
+        "SELECT table_name FROM information_schema.tables "
+        "WHERE table_schema = DATABASE() AND table_name LIKE",
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name LIKE",
+    )
+    sql = sql.replace("ON DUPLICATE KEY UPDATE", "ON CONFLICT(name) DO UPDATE SET")
+    sql = re.sub(r"VALUES\((\w+)\)", r"excluded.\1", sql)
+    sql = sql.replace("IF(", "iif(").replace("GREATEST(", "max(")
+    return sql, extra
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self.pool = conn.pool
+        self._cur = conn.db.cursor()
+
+    @property
+    def description(self):
+        return self._cur.description
+
+    def execute(self, sql, params=()):
+        self.pool.queries.append((" ".join(sql.split()), params))
+        if self.pool.before_execute:
+            self.pool.before_execute(sql)
+        sql, extra = to_sqlite(sql)
+        try:
+            self._cur.execute(sql, params)
+            for statement in extra:
+                self._cur.execute(statement)
+        except sqlite3.OperationalError as e:
+            if "no such table" in str(e):
+                raise FakeError(storage._NO_SUCH_TABLE, str(e)) from e
+            raise
+
+    def executemany(self, sql, rows):
+        self._cur.executemany(to_sqlite(sql)[0], rows)
+
+    def fetchone(self):
+        return self._cur.fetchone()
+
+    def fetchall(self):
+        return self._cur.fetchall()
+
+    def close(self):
+        self._cur.close()
+
+
+class FakeConnection:
+    def __init__(self, pool):
+        self.pool = pool
+        self.db = sqlite3.connect(pool.path, detect_types=sqlite3.PARSE_DECLTYPES)
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        self.db.commit()
+
+    def rollback(self):
+        self.db.rollback()
+
+    def close(self):
+        self.db.close()
+
+
+class FakePool:
+    def __init__(self, path):
+        self.path = path
+        self.queries = []
+        # Called with each statement's SQL before it runs
+        self.before_execute = None
+
+    def get_connection(self):
+        return FakeConnection(self)
+
+
+@pytest.fixture
+def fake_store(tmp_path, monkeypatch):
+    # mysql-connector sends Timestamps as DATETIME and returns datetimes
+    sqlite3.register_adapter(pd.Timestamp, lambda ts: ts.isoformat(" "))
+    sqlite3.register_converter(
+        "DATETIME", lambda raw: datetime.datetime.fromisoformat(raw.decode())
+    )
+    store = MySqlStore.__new__(MySqlStore)
+    CsvStore.__init__(store, str(tmp_path))
+    store.batch_size = 2
+    store._pool = FakePool(str(tmp_path / "mysql.db"))
+    store._create_catalog()
+    yield store
+    del sqlite3.adapters[(pd.Timestamp, sqlite3.PrepareProtocol)]
+    del sqlite3.converters["DATETIME"]
+
+
+def frame_tables(store):
+    with store._cursor() as cur:
+        cur.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' "
+            "AND name GLOB 'frame_*' ORDER BY name"
+        )
+        return [row[0] for row in cur.fetchall()]
+
+
+ALLOTMENT = pd.DataFrame(
+    {
+        "round_no": np.array([1, 1, 1], dtype="int32"),
+        "user_id": ["10", "11", "10"],
+        "allotted_center": pd.Categorical(["101", "102", None]),
+        "score": [1.5, np.nan, 3.0],
+        "created_at": pd.to_datetime(
+            ["2025-01-08 10:00:00.5", None, "2025-01-09 00:00:00.0"]
+        ),
+        "locked": [True, False, True],
+        "venueno": ["V1", None, "V3"],
+    }
+)
+
+
+# ------------------ SAVE / LOAD ------------------ #
+def test_round_trip_types_and_nulls(fake_store):
+    assert fake_store.save("allotments_round_1", ALLOTMENT)
+    assert not fake_store.save("allotments_round_1", ALLOTMENT.copy())
+
+    df = fake_store.load("allotments_round_1")
+    assert list(df.columns) == list(ALLOTMENT.columns)
+    assert df["round_no"].tolist() == [1, 1, 1]
+    assert pd.api.types.is_integer_dtype(df["round_no"])
+    assert df["user_id"].tolist() == ["10", "11", "10"]
+    assert df["allotted_center"].tolist()[:2] == ["101", "102"]
+    assert math.isnan(df["allotted_center"][2])
+    assert df["score"].tolist()[::2] == [1.5, 3.0] and math.isnan(df["score"][1])
+    assert pd.api.types.is_datetime64_any_dtype(df["created_at"])
+    assert df["created_at"][0] == pd.Timestamp("2025-01-08 10:00:00.5")
+    assert pd.isna(df["created_at"][1])
+    assert df["locked"].tolist() == [True, False, True]
+    assert df["venueno"].tolist()[::2] == ["V1", "V3"]
+    assert math.isnan(df["venueno"][1])
+
+    subset = fake_store.load("allotments_round_1", columns=["user_id", "score"])
+    assert list(subset.columns) == ["user_id", "score"]
+    with pytest.raises(FileNotFoundError):
+        fake_store.load("allotments_round_2")
+
+
+def test_resave_replaces_version(fake_store):
+    fake_store.save("allotments_round_1", ALLOTMENT)
+    first = fake_store.mtime_ns("allotments_round_1")
+    changed = ALLOTMENT.assign(venueno=["V9", "V8", "V7"]).drop(columns="score")
+    assert fake_store.save("allotments_round_1", changed)
+
+    assert fake_store.mtime_ns("allotments_round_1") > first
+    df = fake_store.load("allotments_round_1")
+    assert "score" not in df.columns
+    assert df["venueno"].tolist() == ["V9", "V8", "V7"]
+    # The superseded table is dropped
+    version = fake_store.mtime_ns("allotments_round_1")
+    assert frame_tables(fake_store) == [
+        MySqlStore._table("allotments_round_1", version)
+    ]
+
+
+def test_failed_save_keeps_committed_version(fake_store):
+    fake_store.save("allotments_round_1", ALLOTMENT)
+    tables = frame_tables(fake_store)
+
+    def fail_catalog(sql):
+        if sql.startswith("INSERT INTO frames"):
+            raise RuntimeError("connection lost")
+
+    fake_store._pool.before_execute = fail_catalog
+    with pytest.raises(RuntimeError):
+        fake_store.save("allotments_round_1", ALLOTMENT.assign(venueno="V0"))
+    fake_store._pool.before_execute = None
+
+    # The new table was written, but readers still see the old version
+    assert fake_store.load("allotments_round_1")["venueno"].tolist()[0] == "V1"
+    assert frame_tables(fake_store)[0] == tables[0]
+    assert len(frame_tables(fake_store)) == 2
+
+    # The next save drops both older tables
+    fake_store.save("allotments_round_1", ALLOTMENT.assign(venueno="V2"))
+    version = fake_store.mtime_ns("allotments_round_1")
+    assert frame_tables(fake_store) == [
+        MySqlStore._table("allotments_round_1", version)
+    ]
+
+
+def test_reader_follows_concurrent_save(fake_store):
+    fake_store.save("allotments_latest", ALLOTMENT)
+    newer = ALLOTMENT.assign(venueno="V0")
+    state = {"saving": False}
+
+    def save_between_catalog_and_table(sql):
+        # Another replica replaces the frame right after this read of the
+        # catalog, dropping the table the reader was about to open
+        if sql.startswith("SELECT columns_json") and not state["saving"]:
+            state["saving"] = True
+            fake_store.save("allotments_latest", newer)
+
+    fake_store._pool.before_execute = save_between_catalog_and_table
+    df = fake_store.load("allotments_latest")
+    fake_store._pool.before_execute = None
+    assert df["venueno"].tolist() == ["V0"] * 3
+
+
+def test_older_save_does_not_win(fake_store, monkeypatch):
+    fake_store.save("allotments_latest", ALLOTMENT)
+    committed = fake_store.mtime_ns("allotments_latest")
+    # A slow save that started (took its version) before the committed one
+    monkeypatch.setattr(storage.time, "time_ns", lambda: committed - 1)
+    assert fake_store.save("allotments_latest", ALLOTMENT.assign(venueno="V0"))
+
+    assert fake_store.mtime_ns("allotments_latest") == committed
+    assert fake_store.load("allotments_latest")["venueno"].tolist()[0] == "V1"
+    assert frame_tables(fake_store) == [
+        MySqlStore._table("allotments_latest", committed)
+    ]
+
+
+def test_remove_and_list_rounds(fake_store):
+    for rno in (1, 2, 10):
+        fake_store.save(f"allotments_round_{rno}", ALLOTMENT)
+    fake_store.save("allotments_latest", ALLOTMENT)
+    assert fake_store.list_rounds("allotments_round_") == [
+        (1, "allotments_round_1"),
+        (2, "allotments_round_2"),
+        (10, "allotments_round_10"),
+    ]
+
+    fake_store.remove("allotments_round_1")
+    assert not fake_store.exists("allotments_round_1")
+    assert fake_store.mtime_ns("allotments_round_1") == 0
+    assert [rno for rno, _ in fake_store.list_rounds("allotments_round_")] == [2, 10]
+    # allotments_round_10's table shares the prefix but isn't dropped
+    assert len(frame_tables(fake_store)) == 3
+
+
+# ------------------ PORTAL LOOKUP ------------------ #
+def test_lookup_is_one_indexed_query(fake_store):
+    fake_store.save("allotments_latest", ALLOTMENT)
+    version = fake_store.mtime_ns("allotments_latest")
+    table = MySqlStore._table("allotments_latest", version)
+    pool = fake_store._pool
+
+    record = fake_store.lookup("allotments_latest", 10)
+    assert record["user_id"] == "10" and record["allotted_center"] == "101"
+    assert record["round_no"] == 1
+    assert "_row" not in record
+    assert math.isnan(fake_store.lookup("allotments_latest", "11")["venueno"])
+
+    sql, params = pool.queries[-1]
+    assert sql == (
+        f"SELECT * FROM `{table}` WHERE `user_id` = %s ORDER BY `_row` LIMIT 1"
+    )
+    assert params == ("11",)
+    with fake_store._cursor() as cur:
+        cur.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+        plan = " ".join(str(row[-1]) for row in cur.fetchall())
+    assert "USING INDEX" in plan
+
+    assert fake_store.lookup("allotments_latest", "99") is None
+    assert fake_store.lookup("cc_allotments_latest", "10") is None
+
+
+def test_portal_uses_store_lookup(fake_store, monkeypatch):
+    publish(fake_store, "allotments_latest", ALLOTMENT)
+
+    def no_load(*args, **kwargs):
+        raise AssertionError("portal lookup loaded the whole frame")
+
+    monkeypatch.setattr(fake_store, "load", no_load)
+    assert PublishedCache(fake_store).lookup("allotments_latest", "10")[
+        "allotted_center"
+    ] == "101"
+    assert lookup_record(fake_store, "allotments_latest", "12") is None
+    assert not os.path.exists(index_path(fake_store, "allotments_latest"))
+
+
+# ------------------ REAL SERVER ------------------ #
+@pytest.fixture
+def mysql_store(tmp_path):
+    if not os.environ.get("ALLOTMENT_MYSQL_HOST"):
+        pytest.skip("ALLOTMENT_MYSQL_HOST not set")
+    pytest.importorskip("mysql.connector")
+    store = MySqlStore(str(tmp_path), **_mysql_settings())
+    yield store
+    store.remove("test_allotments_latest")
+
+
+def test_lookup_against_server(mysql_store):
+    df = pd.DataFrame(
+        {
+            "round_no": np.array([1, 1, 1], dtype="int32"),
+            "user_id": ["10", "11", "10"],
+            "allotted_center": ["101", "102", "103"],
+            "venueno": ["V1", None, "V3"],
+        }
+    )
+    publish(mysql_store, "test_allotments_latest", df)
+
+    record = mysql_store.lookup("test_allotments_latest", "10")
+    assert record["allotted_center"] == "101" and record["round_no"] == 1
+    assert math.isnan(mysql_store.lookup("test_allotments_latest", "11")["venueno"])
+    assert mysql_store.lookup("test_allotments_latest", "12") is None
+
+    with mysql_store._cursor() as cur:
+        table = mysql_store._table(
+            "test_allotments_latest", mysql_store.mtime_ns("test_allotments_latest")
+        )
+        cur.execute(
+            f"EXPLAIN FORMAT=JSON SELECT * FROM `{table}` "
+            "WHERE `user_id` = %s ORDER BY `_row` LIMIT 1",
+            ("10",),
+        )
+        plan = json.loads(cur.fetchone()[0])
+    assert plan["query_block"]["table"]["access_type"] == "ref"
@@ -0,0 +1,183 @@
+"""Slip PDFs (concat_pdfs, generate_slips, SlipCache) read back with a real
+PDF parser."""
+import io
+import os
+import zipfile
+
+import pytest
+
+from slips import (
+    SlipCache,
+    _render_shard,
+    concat_pdfs,
+    generate_slips,
+    page_path,
+    render_cc_slip,
+    render_exam_slip,
+)
+
+pypdf = pytest.importorskip("pypdf")
+
+
+def exam_rows(n):
+    return [
+        {
+            "round_no": 1,
+            "user_id": f"U{i}",
+            "allotted_center": f"C{i % 3}",
+            "venueno": f"V{i}",
+            "pref1": "C0",
+            "pref2": "C1",
+            "pref3": "C2",
+        }
+        for i in range(n)
+    ]
+
+
+def cc_rows(n):
+    return [
+        {
+            "cc_round_no": 2,
+            "user_id": f"U{i}",
+            "exam_center": f"C{i % 3}",
+            "cc_venueno": f"L{i}",
+            "pref1": "C0",
+            "pref2": "C1",
+            "pref3": "C2",
+        }
+        for i in range(n)
+    ]
+
+
+def read_pages(path):
+    reader = pypdf.PdfReader(path, strict=True)
+    return [page.extract_text() for page in reader.pages]
+
+
+def assert_slip(text, title, user_id):
+    # Title/labels come from the shared form XObject, values from the page
+    assert title in text
+    assert "User ID:" in text
+    assert user_id in text.split()
+
+
+# ------------------ CONCAT ------------------ #
+@pytest.mark.parametrize(
+    "kind, rows, title",
+    [("exam", exam_rows, "Exam Duty Slip"), ("cc", cc_rows, "CC / Lab Duty Slip")],
+)
+def test_concat_form_xobject_shards(tmp_path, kind, rows, title):
+    records = rows(23)
+    shards = []
+    for i in range(0, len(records), 10):
+        path = str(tmp_path / f"shard_{i}.pdf")
+        _render_shard((kind, records[i : i + 10], path))
+        shards.append(path)
+
+    out_path = tmp_path / "out.pdf"
+    with open(out_path, "wb") as f:
+        assert concat_pdfs(shards, f) == 23
+
+    texts = read_pages(out_path)
+    assert len(texts) == 23
+    assert_slip(texts[0], title, "U0")
+    assert_slip(texts[10], title, "U10")
+    assert_slip(texts[-1], title, "U22")
+
+
+def test_concat_standalone_pages(tmp_path):
+    records = exam_rows(3) + cc_rows(2)
+    paths = []
+    for i, row in enumerate(records):
+        render = render_exam_slip if "allotted_center" in row else render_cc_slip
+        paths.append(tmp_path / f"{i}.pdf")
+        paths[-1].write_bytes(render(row))
+
+    out_path = tmp_path / "out.pdf"
+    with open(out_path, "wb") as f:
+        assert concat_pdfs(paths, f) == 5
+
+    texts = read_pages(out_path)
+    assert len(texts) == 5
+    assert_slip(texts[0], "Exam Duty Slip", "U0")
+    assert_slip(texts[-1], "CC / Lab Duty Slip", "U1")
+
+
+# ------------------ GENERATE ------------------ #
+@pytest.mark.parametrize("pages", [False, True])
+def test_generate_merged(tmp_path, pages):
+    pages_dir = str(tmp_path / "pages") if pages else None
+    out_path = str(tmp_path / "slips.pdf")
+    generate_slips(
+        exam_rows(25), "exam", out_path, shard_size=10, workers=2, pages_dir=pages_dir
+    )
+
+    texts = read_pages(out_path)
+    assert len(texts) == 25
+    assert_slip(texts[0], "Exam Duty Slip", "U0")
+    assert_slip(texts[-1], "Exam Duty Slip", "U24")
+    if pages:
+        assert_slip(read_pages(page_path(pages_dir, 24))[0], "Exam Duty Slip", "U24")
+
+
+@pytest.mark.parametrize("pages", [False, True])
+def test_generate_zip(tmp_path, pages):
+    pages_dir = str(tmp_path / "pages") if pages else None
+    out_path = str(tmp_path / "slips.zip")
+    generate_slips(
+        exam_rows(25),
+        "exam",
+        out_path,
+        layout="zip",
+        group_key="allotted_center",
+        shard_size=10,
+        workers=2,
+        pages_dir=pages_dir,
+    )
+
+    with zipfile.ZipFile(out_path) as zf:
+        assert sorted(zf.namelist()) == ["C0.pdf", "C1.pdf", "C2.pdf"]
+        zf.extractall(tmp_path / "parts")
+    texts = read_pages(tmp_path / "parts" / "C1.pdf")
+    assert len(texts) == 8
+    assert_slip(texts[0], "Exam Duty Slip", "U1")
+    assert_slip(texts[-1], "Exam Duty Slip", "U22")
+
+
+# ------------------ PER-CANDIDATE CACHE ------------------ #
+def cached_files(cache_dir):
+    return sorted(
+        str(path.relative_to(cache_dir)) for path in cache_dir.rglob("*.pdf")
+    )
+
+
+def test_slip_cache_replaces_stale_slips(tmp_path):
+    cache = SlipCache(str(tmp_path))
+    row, other = exam_rows(2)
+    texts = read_pages(io.BytesIO(cache.get("exam", row)))
+    assert_slip(texts[0], "Exam Duty Slip", "U0")
+    cache.get("exam", other)
+    cache.get("exam", row)
+    assert len(cached_files(tmp_path)) == 2
+
+    # Reallotted: the new slip replaces the old one, on disk and in memory
+    moved = dict(row, allotted_center="C2")
+    assert "C2" in read_pages(io.BytesIO(cache.get("exam", moved)))[0]
+    files = cached_files(tmp_path)
+    assert len(files) == 2
+    assert [f for f in files if f.startswith("1/exam_U0/")] == [
+        os.path.relpath(cache._path("exam", moved), tmp_path)
+    ]
+    assert len(cache._memory) == 2
+
+
+def test_slip_cache_prune(tmp_path):
+    cache = SlipCache(str(tmp_path))
+    rows = [dict(exam_rows(1)[0], round_no=round_no) for round_no in (1, 2, 3)]
+    for row in rows:
+        cache.get("exam", row)
+    cache.prune([3])
+    assert cached_files(tmp_path) == [
+        os.path.relpath(cache._path("exam", rows[2]), tmp_path)
+    ]
+    assert len(cache._memory) == 1
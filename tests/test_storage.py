@@ -0,0 +1,222 @@
+"""Published frames, the user portal index and the locked-user index."""
+import json
+import math
+import os
+import shutil
+import sqlite3
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from allotment_engine import (
+    ALLOTTED,
+    EXCLUDED,
+    EXCLUDED_THIS_ROUND,
+    NO_SEAT,
+    NOT_ALLOTTED_NO_SEAT,
+    is_allotted,
+)
+from storage import (
+    LOCK_INDEX,
+    CsvStore,
+    ParquetStore,
+    PublishedCache,
+    drop_locked_round,
+    index_path,
+    load_locked_users,
+    lookup_record,
+    publish,
+    save_locked_round,
+    unpublish,
+)
+
+
+@pytest.fixture
+def store(tmp_path):
+    return CsvStore(str(tmp_path))
+
+
+def allotments():
+    return pd.DataFrame(
+        {
+            "round_no": np.array([1, 1, 1, 1], dtype="int32"),
+            "user_id": ["10", "11", "12", "10"],
+            "allotted_center": pd.Categorical(
+                ["101", "NOT ALLOTTED (NO SEAT)", "102", "103"]
+            ),
+            "pref3": ["101", None, "102", "103"],
+            "score": [0.5, np.nan, 2.0, 3.0],
+            "created_at": pd.to_datetime(
+                ["2025-01-08 20:33:43", "2025-01-09 08:00:00", None, "2025-01-10"],
+                format="mixed",
+            ),
+        }
+    )
+
+
+def test_lookup_native_columns(store):
+    publish(store, "allotments_latest", allotments())
+
+    record = lookup_record(store, "allotments_latest", "10")
+    assert record == {
+        "round_no": 1,
+        "user_id": "10",
+        "allotted_center": "101",
+        "pref3": "101",
+        "score": 0.5,
+        "created_at": "2025-01-08 20:33:43",
+    }
+    assert isinstance(record["round_no"], int)
+
+    # Missing values come back as NaN, like the frame's own records
+    record = lookup_record(store, "allotments_latest", 11)
+    assert math.isnan(record["pref3"]) and math.isnan(record["score"])
+    assert math.isnan(lookup_record(store, "allotments_latest", "12")["created_at"])
+    assert lookup_record(store, "allotments_latest", "99") is None
+    assert lookup_record(store, "cc_allotments_latest", "10") is None
+
+
+def test_first_row_per_user_wins(store):
+    publish(store, "allotments_latest", allotments())
+    cache = PublishedCache(store)
+    assert cache.lookup("allotments_latest", "10")["allotted_center"] == "101"
+
+
+def test_old_layout_is_rebuilt(store):
+    publish(store, "allotments_latest", allotments())
+    path = index_path(store, "allotments_latest")
+
+    # Pre-native layout: one JSON document per user
+    os.remove(path)
+    db = sqlite3.connect(path)
+    db.execute("CREATE TABLE meta (columns TEXT NOT NULL)")
+    db.execute("INSERT INTO meta VALUES (?)", (json.dumps(["user_id"]),))
+    db.execute("CREATE TABLE records (user_id TEXT PRIMARY KEY, record TEXT)")
+    db.execute("INSERT INTO records VALUES ('10', '[\"10\"]')")
+    db.commit()
+    db.close()
+
+    cache = PublishedCache(store)
+    assert cache.lookup("allotments_latest", "12")["allotted_center"] == "102"
+    assert lookup_record(store, "allotments_latest", "10")["allotted_center"] == "101"
+
+
+def test_cache_reloads_republished_index(store):
+    publish(store, "allotments_latest", allotments())
+    cache = PublishedCache(store)
+    assert cache.lookup("allotments_latest", "10")["allotted_center"] == "101"
+
+    # Republished: the index file is swapped (new inode)
+    moved = allotments().assign(allotted_center=["104", "105", "106", "107"])
+    publish(store, "allotments_latest", moved)
+    assert cache.lookup("allotments_latest", "10")["allotted_center"] == "104"
+
+
+def test_cache_reloads_index_changed_in_place(store, tmp_path):
+    publish(store, "allotments_latest", allotments())
+    cache = PublishedCache(store)
+    assert cache.lookup("allotments_latest", "12")["allotted_center"] == "102"
+
+    # Same file (inode) overwritten, e.g. copied over by a deploy script
+    other = CsvStore(str(tmp_path / "other"))
+    moved = allotments().assign(allotted_center=["104", "105", "106", "107"])
+    publish(other, "allotments_latest", moved)
+    path = index_path(store, "allotments_latest")
+    inode = os.stat(path).st_ino
+    shutil.copyfile(index_path(other, "allotments_latest"), path)
+    assert os.stat(path).st_ino == inode
+
+    assert cache.lookup("allotments_latest", "12")["allotted_center"] == "106"
+
+
+def test_cache_invalidate(store):
+    publish(store, "allotments_latest", allotments())
+    publish(store, "cc_allotments_latest", allotments())
+    cache = PublishedCache(store)
+    cache.lookup("allotments_latest", "10")
+    cache.lookup("cc_allotments_latest", "10")
+    db = cache._entries["allotments_latest"][1]
+
+    cache.invalidate("allotments_latest")
+    assert list(cache._entries) == ["cc_allotments_latest"]
+    with pytest.raises(sqlite3.ProgrammingError):
+        db.execute("SELECT 1")
+    # The next lookup reopens the index
+    assert cache.lookup("allotments_latest", "11")["user_id"] == "11"
+
+    cache.invalidate()
+    assert cache._entries == {}
+
+    # Unpublished frames drop their entry too
+    cache.lookup("allotments_latest", "10")
+    unpublish(store, "allotments_latest")
+    assert cache.lookup("allotments_latest", "10") is None
+    assert "allotments_latest" not in cache._entries
+
+
+# ------------------ LOCKED-USER INDEX ------------------ #
+def round_frame(round_no, allotted, no_seat=(), excluded=()):
+    rows = (
+        [(uid, "101", ALLOTTED) for uid in allotted]
+        + [(uid, NOT_ALLOTTED_NO_SEAT, NO_SEAT) for uid in no_seat]
+        + [(uid, EXCLUDED_THIS_ROUND, EXCLUDED) for uid in excluded]
+    )
+    return pd.DataFrame(
+        {
+            "round_no": np.int32(round_no),
+            "user_id": [uid for uid, _, _ in rows],
+            "allotted_center": pd.Categorical([center for _, center, _ in rows]),
+            "status": pd.Categorical([status for _, _, status in rows]),
+        }
+    )
+
+
+def scan_locked(store, before_round):
+    """Allotted users of saved rounds below `before_round`, from the rounds."""
+    locked = set()
+    for rno, name in store.list_rounds("allotments_round_"):
+        if rno < before_round:
+            df = store.load(name, dtype={"user_id": str})
+            locked.update(df.loc[is_allotted(df), "user_id"].astype(str))
+    return locked
+
+
+def save_round(store, round_no, df):
+    store.save(f"allotments_round_{round_no}", df)
+    save_locked_round(store, round_no, df)
+
+
+def assert_index_matches_scan(store):
+    for before_round in range(1, 6):
+        assert load_locked_users(store, before_round) == scan_locked(
+            store, before_round
+        )
+
+
+@pytest.mark.parametrize("backend", [CsvStore, ParquetStore])
+def test_lock_index_matches_round_scan(tmp_path, backend):
+    store = backend(str(tmp_path))
+    assert load_locked_users(store, 5) == set()
+
+    save_round(store, 1, round_frame(1, ["010", "11"], no_seat=["12"]))
+    save_round(store, 2, round_frame(2, ["12"], excluded=["010", "11"]))
+    save_round(store, 3, round_frame(3, ["13", "14"], no_seat=["15"]))
+    assert load_locked_users(store, 3) == {"010", "11", "12"}
+    assert_index_matches_scan(store)
+
+    # Round 2 saved again with another outcome replaces its entries
+    save_round(store, 2, round_frame(2, ["15"], no_seat=["12"]))
+    assert load_locked_users(store, 3) == {"010", "11", "15"}
+    assert_index_matches_scan(store)
+
+    # Round 3 rolled back
+    store.remove("allotments_round_3")
+    drop_locked_round(store, 3)
+    assert load_locked_users(store, 5) == {"010", "11", "15"}
+    assert_index_matches_scan(store)
+
+    # A missing index is rebuilt from the saved rounds
+    store.remove(LOCK_INDEX)
+    assert_index_matches_scan(store)
+    assert store.exists(LOCK_INDEX)